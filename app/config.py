@@ -0,0 +1,38 @@
+import os
+
+from pydantic import BaseModel, Field
+
+from database.config import DatabaseSettings, _env_bool
+
+
+class AppSettings(BaseModel):
+    """Настройки приложения для `create_app`. `from_env()` читает их из переменных окружения APP_*,
+    настройки базы - из DATABASE_*/SQLITE_* (см. DatabaseSettings).
+
+    - warmup: При старте открыть соединения пула, настроить мапперы, скомпилировать частые запросы
+      и заполнить кеши, чтобы их не ждали первые запросы каждого воркера.
+    - warmup_connections: Сколько соединений открыть заранее, по умолчанию - pool_size.
+    - shutdown_timeout: Сколько секунд при остановке ждать применения поставленных в очередь записей.
+    - upcoming_index: Отвечать на запросы ленты из индекса предстоящих событий в памяти. Индекс обновляется
+      сообщениями push_hub, поэтому по умолчанию (None) включен только с общим для всех воркеров брокером.
+      С LocalPushBroker его можно включить явно (APP_UPCOMING_INDEX=1), если приложение работает в одном
+      воркере: тогда все изменения проходят через этот процесс.
+    """
+    database: DatabaseSettings = Field(default_factory=DatabaseSettings)
+    warmup: bool = True
+    warmup_connections: int | None = None
+    shutdown_timeout: float = 10
+    upcoming_index: bool | None = None
+
+    @classmethod
+    def from_env(cls) -> "AppSettings":
+        defaults = cls()
+        warmup_connections = os.environ.get('APP_WARMUP_CONNECTIONS')
+        upcoming_index = os.environ.get('APP_UPCOMING_INDEX')
+        return cls(
+            database=DatabaseSettings.from_env(),
+            warmup=_env_bool('APP_WARMUP', defaults.warmup),
+            warmup_connections=int(warmup_connections) if warmup_connections else None,
+            shutdown_timeout=float(os.environ.get('APP_SHUTDOWN_TIMEOUT', defaults.shutdown_timeout)),
+            upcoming_index=_env_bool('APP_UPCOMING_INDEX', False) if upcoming_index else None,
+        )
@@ -1,35 +1,65 @@
 from fastapi import APIRouter
 from fastapi import HTTPException, Depends
+from pydantic import TypeAdapter
+from sqlalchemy.exc import IntegrityError
 from starlette import status
 
-from app.schemas.auth import UserCreate, User, TokenPair
+from app.schemas.auth import UserCreate, User, TokenPair, RefreshToken
 from app import models
 from app.services import auth
+from app.services.encryption import PasswordHasherBusy
+from app.services.ratelimit import register_ip_limiter, login_ip_limiter, login_username_limiter, ServerBusyException
+from app.services.export import ExportFormatQuery, export_response
+from app.services.pagination import PageParams, NEXT_CURSOR_HEADER, decode_cursor, split_page
+from app.services.responses import json_response
 
 router = APIRouter(prefix='/api')
 
+UserList = TypeAdapter(list[User])
 
-@router.post('/users', response_model=User)
+
+@router.post('/users', response_model=User, dependencies=[Depends(register_ip_limiter.by_ip)])
 async def register(user: UserCreate):
-    if await models.User.is_username_email_exists(username=user.username, email=user.email):
+    try:
+        await models.User.create_user(**user.model_dump())
+    except IntegrityError:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email or username already exists")
-    await models.User.create_user(**user.dict())
+    except PasswordHasherBusy:
+        raise ServerBusyException
     return user
 
 
 @router.get('/users', response_model=list[User])
-async def get_list_users(user: models.User = Depends(auth.get_current_user)):
-    if user.is_admin:
-        users = await models.User.all()
-        return users
-    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
-                        detail='This action is only available to administrators.')
+async def get_list_users(page: PageParams = Depends(),
+                         user: models.User = Depends(auth.get_current_admin)):
+    after_id = decode_cursor(page.cursor, int)[0] if page.cursor else None
+    users = await models.User.get_users_page(limit=page.limit + 1, after_id=after_id)
+    users, next_cursor = split_page(users, page.limit, key=lambda row: (row['id'],))
+    return json_response(UserList, users, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+
+
+@router.get('/users/export')
+async def export_users(export_format: str = ExportFormatQuery, user: models.User = Depends(auth.get_current_admin)):
+    User = models.User
+    rows = User.stream(User.id, User.username, User.email, User.created, User.is_admin)
+    return export_response(rows, export_format, filename='users')
 
 
-@router.post('/token', response_model=TokenPair)
+@router.post('/token', response_model=TokenPair, dependencies=[Depends(login_ip_limiter.by_ip)])
 async def create_token(user: UserCreate):
-    user_model = await models.User.get_valid_user(user.username, user.password)
+    await login_username_limiter.hit(user.username.lower())
+    try:
+        user_model = await models.User.get_valid_user(user.username, user.password)
+    except PasswordHasherBusy:
+        raise ServerBusyException
     if user_model is None:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='User not found')
     access, refresh = auth.create_jwt_token_pair(str(user_model.id))
     return TokenPair(access_token=access, refresh_token=refresh)
+
+
+@router.post('/token/refresh', response_model=TokenPair)
+async def refresh_token(body: RefreshToken):
+    """Новая пара токенов по refresh токену. Каждый refresh токен принимается один раз."""
+    access, refresh = await auth.refresh_jwt_token_pair(body.refresh_token)
+    return TokenPair(access_token=access, refresh_token=refresh)
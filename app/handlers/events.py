@@ -1,31 +1,215 @@
-from fastapi import APIRouter, Depends, Path, Body
+import json
+from datetime import datetime, timezone
+
+from fastapi import APIRouter, Depends, Path, Body, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
 from fastapi.exceptions import HTTPException
+from pydantic import TypeAdapter, ValidationError
 from sqlalchemy.exc import NoResultFound, ArgumentError
 from starlette import status
 from app import schemas
 from app import models
 from app.services import auth
+from app.services.feed import events_feed, etag_matches
+from app.services.push import push_hub
+from app.services.export import ExportFormatQuery, export_response
+from app.services.pagination import PageParams, DEFAULT_PAGE_SIZE, NEXT_CURSOR_HEADER, decode_cursor, split_page
+from app.services.responses import json_response
+from database.types import as_utc
 
 router = APIRouter(prefix='/api')
 
+# Схемы ответов собираются один раз при импорте; обработчики сериализуют через них напрямую.
+EventList = TypeAdapter(list[schemas.Event])
+EventDetail = TypeAdapter(schemas.Event)
+EventUsersList = TypeAdapter(list[schemas.EventUsers])
+BulkSubscribeResults = TypeAdapter(list[schemas.BulkSubscribeResult])
+EventImportResults = TypeAdapter(list[schemas.EventImportResult])
+
+
+PreviewQuery = Query(default=models.EVENT_USERS_PREVIEW, ge=0, le=models.EVENT_USERS_PREVIEW,
+                     description='How many subscriber names to include per event')
+
+
+class TimeRange:
+    """Интервал [from, to) по времени начала события. Время без часового пояса считается UTC."""
+
+    def __init__(self, start: datetime | None = Query(default=None, alias='from',
+                                                      description='Events starting at or after (default: now)'),
+                 end: datetime | None = Query(default=None, alias='to', description='Events starting before')):
+        self.start = as_utc(start) if start is not None else None
+        self.end = as_utc(end) if end is not None else None
+        if self.start is not None and self.end is not None and self.start >= self.end:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="'from' must be earlier than 'to'")
+
+    @property
+    def is_default(self) -> bool:
+        return self.start is None and self.end is None
+
+
+async def load_events_page(page: PageParams, user_id: int | None = None, preview: int = models.EVENT_USERS_PREVIEW,
+                           period: TimeRange | None = None) -> tuple[list[dict], str | None]:
+    """Загружает страницу событий, возвращает (события, курсор следующей страницы)."""
+    after = decode_cursor(page.cursor, datetime.fromisoformat, int) if page.cursor else None
+    events = await models.Event.get_events_page(limit=page.limit + 1, after=after, user_id=user_id,
+                                                preview=preview, start=period and period.start,
+                                                end=period and period.end)
+    return split_page(events, page.limit, key=lambda event: (event['meeting_time'], event['id']))
+
+
+async def build_events_feed() -> tuple[bytes, dict, float | None]:
+    """Сериализует первую страницу ленты. Лента устаревает, когда начинается ближайшее событие."""
+    events, next_cursor = await load_events_page(PageParams(cursor=None, limit=DEFAULT_PAGE_SIZE))
+    body = EventList.dump_json(EventList.validate_python(events))
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else {}
+    expires_in = None
+    if events:
+        now = datetime.now(timezone.utc)
+        expires_in = max((events[0]['meeting_time'] - now).total_seconds(), 0)
+    return body, headers, expires_in
+
 
 @router.get('/events', response_model=list[schemas.Event])
-async def get_list_events():
-    events = await models.Event.get_events_with_users()
-    return events
+async def get_list_events(request: Request, page: PageParams = Depends(), preview: int = PreviewQuery,
+                          period: TimeRange = Depends()):
+    if not page.is_default or not period.is_default or preview != models.EVENT_USERS_PREVIEW:
+        events, next_cursor = await load_events_page(page, preview=preview, period=period)
+        headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+        return json_response(EventList, events, headers=headers)
+
+    body, headers = await events_feed.get(build_events_feed)
+    headers = {**headers, 'Cache-Control': 'no-cache'}
+    if etag_matches(headers['ETag'], request.headers.get('if-none-match')):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type='application/json', headers=headers)
+
+
+@router.get('/events/search', response_model=list[schemas.Event])
+async def search_events(q: str = Query(min_length=1, max_length=200,
+                                       description='Words to find in the title or description'),
+                        page: PageParams = Depends(), preview: int = PreviewQuery, period: TimeRange = Depends()):
+    """События, в названии или описании которых есть все слова запроса, от наиболее релевантных."""
+    after = decode_cursor(page.cursor, float, int) if page.cursor else None
+    events = await models.Event.search(q, limit=page.limit + 1, after=after, start=period.start, end=period.end,
+                                       preview=preview)
+    events, next_cursor = split_page(events, page.limit, key=lambda event: (event['rank'], event['id']))
+    return json_response(EventList, events, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+
 
+@router.get('/events/stream', response_class=StreamingResponse,
+             responses={status.HTTP_200_OK: {'content': {'text/event-stream': {}}}})
+async def stream_events():
+    """Server-sent events: создание событий ('events_created') и изменения подписок ('subscription').
 
-@router.post('/event/{event_id}', response_model=schemas.Event)
-async def subscribe_or_unsubscribe(event_id: str, action: schemas.SubscribeToEvent,
+    Заменяет периодический опрос GET /events. Поток закрывается, если клиент не успевает читать,
+    после переподключения клиенту нужно заново загрузить ленту.
+    """
+    async def frames():
+        yield b'retry: 3000\n\n'
+        async for frame in push_hub.listen(lambda message: message.sse, heartbeat=b': ping\n\n'):
+            yield frame
+
+    return StreamingResponse(frames(), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@router.websocket('/events/ws')
+async def events_websocket(websocket: WebSocket):
+    """Те же сообщения, что и в /events/stream, через WebSocket."""
+    await websocket.accept()
+    try:
+        async for text in push_hub.listen(lambda message: message.data.decode(), heartbeat='{"type":"ping"}'):
+            await websocket.send_text(text)
+    except WebSocketDisconnect:
+        return
+    await websocket.close(code=1012)  # сервер перезапускается или клиент отстал - нужно переподключиться
+
+
+@router.get('/events/export')
+async def export_events(export_format: str = ExportFormatQuery, user: models.User = Depends(auth.get_current_admin)):
+    """Все события (включая прошедшие) потоком, без списков подписчиков."""
+    Event = models.Event
+    rows = Event.stream(Event.id, Event.title, Event.description, Event.meeting_time, Event.subscriber_count)
+    return export_response(rows, export_format, filename='events')
+
+
+@router.post('/event/{event_id}', response_model=schemas.Event,
+             responses={status.HTTP_204_NO_CONTENT: {'description': 'Done, return_event=false'}})
+async def subscribe_or_unsubscribe(event_id: int, action: schemas.SubscribeToEvent,
+                                   return_event: bool = Query(default=True),
                                    user: models.User = Depends(auth.get_current_user)):
     try:
-        event = await models.Event.add_user_or_remove(event_id=event_id, user=user, action=action.action)
+        changed = await models.Event.add_user_or_remove(event_id=event_id, user_id=user.id, action=action.action)
     except NoResultFound as exc:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=exc)
-    return event
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(exc))
+    if not changed:
+        detail = 'User already subscribed' if action.action == 'add' else 'User is not a subscriber'
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=detail)
+    if not return_event:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+    return json_response(EventDetail, await models.Event.get_event(event_id))
 
 
 @router.get('/events/my', response_model=list[schemas.Event])
-async def get_my_events(user: models.User = Depends(auth.get_current_user)):
-    events = await models.Event.get_users_events(user.id)
-    return events
+async def get_my_events(page: PageParams = Depends(), preview: int = PreviewQuery, period: TimeRange = Depends(),
+                        user: models.User = Depends(auth.get_current_user)):
+    events, next_cursor = await load_events_page(page, user_id=user.id, preview=preview, period=period)
+    return json_response(EventList, events, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+
+
+@router.get('/event/{event_id}/users', response_model=list[schemas.EventUsers])
+async def get_event_subscribers(event_id: int, page: PageParams = Depends()):
+    after_id = decode_cursor(page.cursor, int)[0] if page.cursor else None
+    users = await models.Event.get_subscribers_page(event_id, limit=page.limit + 1, after_id=after_id)
+    if not users and not await models.Event.exists(id=event_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f'Event with id {event_id} does not exist')
+    users, next_cursor = split_page(users, page.limit, key=lambda row: (row['id'],))
+    return json_response(EventUsersList, users, headers={NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None)
+
+
+@router.post('/events/subscriptions', response_model=list[schemas.BulkSubscribeResult])
+async def bulk_subscribe_or_unsubscribe(body: schemas.BulkSubscribe,
+                                        user: models.User = Depends(auth.get_current_user)):
+    results = await models.Event.bulk_add_user_or_remove(event_ids=body.event_ids, user_id=user.id,
+                                                         action=body.action)
+    return json_response(BulkSubscribeResults,
+                         [{'event_id': event_id, 'status': result} for event_id, result in results.items()])
+
+
+@router.post('/events/import', response_model=list[schemas.EventImportResult],
+             openapi_extra={'requestBody': {'content': {
+                 'application/json': {'schema': {'type': 'array', 'items': schemas.EventCreate.model_json_schema()}},
+                 'application/x-ndjson': {'schema': {'type': 'string'}},
+             }, 'required': True}})
+async def import_events(request: Request, user: models.User = Depends(auth.get_current_admin)):
+    """Массовое создание событий из JSON массива или NDJSON (одно событие на строку)."""
+    body = await request.body()
+    if request.headers.get('content-type', '').startswith('application/x-ndjson'):
+        items = [line for line in body.splitlines() if line.strip()]
+    else:
+        try:
+            items = json.loads(body)
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Body must be a JSON array')
+        if not isinstance(items, list):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Body must be a JSON array')
+    if len(items) > schemas.MAX_IMPORT_SIZE:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                            detail=f'At most {schemas.MAX_IMPORT_SIZE} events per request')
+
+    results, rows = [], []
+    for index, item in enumerate(items):
+        try:
+            event = (schemas.EventCreate.model_validate_json(item) if isinstance(item, bytes)
+                     else schemas.EventCreate.model_validate(item))
+        except ValidationError as exc:
+            results.append({'index': index, 'status': 'invalid', 'error': str(exc)})
+            continue
+        results.append({'index': index, 'status': 'created'})
+        rows.append(event.model_dump())
+
+    ids = iter(await models.Event.bulk_create(rows))
+    for result in results:
+        if result['status'] == 'created':
+            result['id'] = next(ids)
+    return json_response(EventImportResults, results)
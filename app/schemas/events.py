@@ -4,6 +4,11 @@ from pydantic import BaseModel, Field, field_validator, ValidationInfo
 
 from app import models
 
+# Максимальное количество элементов в одном пакетном запросе.
+MAX_BATCH_SIZE = 1000
+# Максимальное количество событий в одном импорте.
+MAX_IMPORT_SIZE = 50_000
+
 
 class EventUsers(BaseModel):
     username: str
@@ -13,6 +18,7 @@ class Event(BaseModel):
     title: str = Field(max_length=100)
     description: str
     meeting_time: datetime
+    subscriber_count: int = 0
     users: list[EventUsers]
 
 
@@ -26,3 +32,26 @@ class SubscribeToEvent(BaseModel):
         if act not in allowed_action:
             raise ValueError(f'action must be one of {allowed_action}')
         return act
+
+
+class BulkSubscribe(SubscribeToEvent):
+    event_ids: list[int] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+
+class BulkSubscribeResult(BaseModel):
+    event_id: int
+    status: str = Field(..., examples=['subscribed', 'already_subscribed', 'unsubscribed', 'not_subscribed',
+                                       'not_found'])
+
+
+class EventCreate(BaseModel):
+    title: str = Field(max_length=100)
+    description: str
+    meeting_time: datetime
+
+
+class EventImportResult(BaseModel):
+    index: int
+    status: str = Field(..., examples=['created', 'invalid'])
+    id: int | None = None
+    error: str | None = None
@@ -1,4 +1,7 @@
+import hashlib
 import os
+import time
+import uuid
 from fastapi.security import OAuth2PasswordBearer
 from fastapi import Depends, HTTPException
 from datetime import timedelta, datetime, timezone
@@ -7,6 +10,9 @@ import jwt
 from sqlalchemy import exc
 
 from app.models import User
+from app.services.cache import TTLCache
+from app.services.metrics import registry
+from app.services.revocation import revoked_tokens
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 SECRET_KEY = os.environ.get("JWT_SECRET_KEY", "secret_key")
@@ -14,6 +20,10 @@ ALGORITHM = "HS512"
 USER_IDENTIFIER = "user_id"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 REFRESH_TOKEN_EXPIRE_HOURS = 24
+TOKEN_CACHE_SIZE = int(os.environ.get("TOKEN_CACHE_SIZE", 10_000))
+
+# Проверенные payload токенов по sha256 токена, хранятся до истечения 'exp'.
+verified_tokens = TTLCache(maxsize=TOKEN_CACHE_SIZE)
 
 CredentialsException = HTTPException(
     status_code=status.HTTP_401_UNAUTHORIZED,
@@ -38,28 +48,58 @@ def create_jwt_token_pair(user_id: str) -> tuple[str, str]:
     """ Создает пару токенов.
         :return: access_token, refresh_token
         """
-    access_payload = {USER_IDENTIFIER: user_id, 'type': 'access'}
+    access_payload = {USER_IDENTIFIER: user_id, 'type': 'access', 'jti': uuid.uuid4().hex}
     access_token = _create_token(access_payload, delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
 
-    refresh_payload = {USER_IDENTIFIER: user_id, 'type': 'refresh'}
+    refresh_payload = {USER_IDENTIFIER: user_id, 'type': 'refresh', 'jti': uuid.uuid4().hex}
     refresh_token = _create_token(refresh_payload, delta=timedelta(hours=REFRESH_TOKEN_EXPIRE_HOURS))
 
     return access_token, refresh_token
 
 
+async def refresh_jwt_token_pair(refresh_token: str) -> tuple[str, str]:
+    """Ротация: отзывает предъявленный refresh токен и выдает новую пару.
+
+    Повторное предъявление уже использованного refresh токена отклоняется. Проверка пароля
+    не нужна, поэтому обновление не занимает воркер bcrypt.
+        :return: access_token, refresh_token
+    """
+    payload = get_token_payload(refresh_token, 'refresh')
+    jti = payload.get('jti')
+    if jti is None:
+        raise InvalidRefreshTokenException
+    if not await revoked_tokens.revoke(jti, ttl=payload['exp'] - time.time()):
+        raise InvalidRefreshTokenException
+
+    try:
+        user = await User.get_cached(int(payload[USER_IDENTIFIER]))
+    except ValueError:
+        raise InvalidRefreshTokenException
+    if user is None:
+        raise InvalidRefreshTokenException
+    return create_jwt_token_pair(str(user.id))
+
+
 def _create_token(payload: dict, delta: timedelta) -> str:
     """ Создает токен.
     :return: token"""
     expires_delta = {'exp': datetime.now(tz=timezone.utc) + delta}
     payload.update(expires_delta)
-    return jwt.encode(payload, key=SECRET_KEY, algorithm=ALGORITHM)
+    start = time.perf_counter()
+    token = jwt.encode(payload, key=SECRET_KEY, algorithm=ALGORITHM)
+    registry.jwt_seconds['encode'].observe(time.perf_counter() - start)
+    return token
 
 
 def get_token_payload(token: str, token_type: str) -> dict:
-    try:
-        payload = jwt.decode(token, key=SECRET_KEY, algorithms=[ALGORITHM])
-    except jwt.exceptions.PyJWTError:
-        raise get_invalid_token_exc(token_type)
+    """Возвращает payload токена. Проверка подписи кешируется, проверка типа выполняется всегда."""
+    digest = hashlib.sha256(token.encode()).digest()
+    payload = verified_tokens.get(digest)
+    if payload is None:
+        payload = decode_token(token, token_type)
+        ttl = payload.get('exp', 0) - time.time()
+        if ttl > 0:
+            verified_tokens.set(digest, payload, ttl=ttl)
 
     if payload.get('type') != token_type:
         raise get_invalid_token_exc(token_type)
@@ -68,6 +108,18 @@ def get_token_payload(token: str, token_type: str) -> dict:
     return payload
 
 
+def decode_token(token: str, token_type: str) -> dict:
+    """Полная проверка подписи и срока действия токена, без кеша."""
+    start = time.perf_counter()
+    try:
+        payload = jwt.decode(token, key=SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.exceptions.PyJWTError:
+        raise get_invalid_token_exc(token_type)
+    finally:
+        registry.jwt_seconds['decode'].observe(time.perf_counter() - start)
+    return payload
+
+
 def get_invalid_token_exc(token_type: str) -> HTTPException:
     if token_type == "access":
         return InvalidAccessTokenException
@@ -81,17 +133,27 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     Parameters:
     - `token` берется из запроса.
     Returns:
-    - `User`: Объект пользователя, полученный из базы данных.
+    - `User`: Объект пользователя, полученный из кеша или базы данных.
     """
     payload = get_token_payload(token, "access")
 
     try:
-        user = await User.get(id=payload[USER_IDENTIFIER])
-    except exc.NoResultFound:
+        user = await User.get_cached(int(payload[USER_IDENTIFIER]))
+    except (exc.NoResultFound, ValueError):
+        raise CredentialsException
+    if user is None:
         raise CredentialsException
 
     return user
 
+
+async def get_current_admin(user: User = Depends(get_current_user)) -> User:
+    """Текущий пользователь, если он администратор, иначе 403."""
+    if not user.is_admin:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN,
+                            detail='This action is only available to administrators.')
+    return user
+
 # token = create_token({'123': '123'}, delta=timedelta(seconds=1))
 # print(token)
 # time.sleep(1)
@@ -0,0 +1,141 @@
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Hashable
+
+USER_CACHE_TTL = float(os.environ.get("USER_CACHE_TTL", 60))
+USER_CACHE_SIZE = int(os.environ.get("USER_CACHE_SIZE", 10_000))
+
+
+class TTLCache:
+    """LRU-кеш в памяти процесса с ограничением размера и временем жизни записей.
+
+    При переполнении вытесняется запись, к которой дольше всего не обращались.
+    """
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float | None, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at is not None and expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        """:param ttl: Время жизни записи в секундах. По умолчанию берется ttl кеша."""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+        }
+
+    def __len__(self):
+        return len(self._data)
+
+
+class CacheBackend(ABC):
+    """Хранилище кеша. Общее для нескольких воркеров (например, Redis) реализуется наследованием."""
+
+    @abstractmethod
+    async def get(self, key: str) -> Any | None:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float | None = None):
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str):
+        ...
+
+
+class LocalCacheBackend(CacheBackend):
+    """Хранилище в памяти процесса. Используется по умолчанию и как замена общего хранилища в разработке."""
+
+    def __init__(self, maxsize: int, ttl: float | None = None):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> Any | None:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Any, ttl: float | None = None):
+        self._cache.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str):
+        self._cache.delete(key)
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class Cache:
+    """Именованный кеш поверх `CacheBackend` со счетчиками попаданий и промахов.
+
+    Хранилище можно заменить в любой момент: `cache.backend = MyRedisBackend(...)`.
+    """
+
+    def __init__(self, name: str, backend: CacheBackend, ttl: float | None = None):
+        self.name = name
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, key: Hashable) -> str:
+        return f'{self.name}:{key}'
+
+    async def get(self, key: Hashable) -> Any | None:
+        value = await self.backend.get(self._key(key))
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: Hashable, value: Any, ttl: float | None = None):
+        await self.backend.set(self._key(key), value, ttl=self.ttl if ttl is None else ttl)
+
+    async def delete(self, key: Hashable):
+        await self.backend.delete(self._key(key))
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+        }
+
+
+user_cache = Cache('users', LocalCacheBackend(maxsize=USER_CACHE_SIZE), ttl=USER_CACHE_TTL)
@@ -1,11 +1,31 @@
+import asyncio
+import os
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+
 import bcrypt
 
+from app.services.metrics import registry, Histogram
+
+# Стоимость bcrypt (log2 количества раундов). Хеши с меньшей стоимостью обновляются при входе.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+# Количество потоков/процессов для bcrypt, они же - ограничение одновременных вычислений.
+PASSWORD_HASHER_WORKERS = int(os.environ.get("PASSWORD_HASHER_WORKERS", min(4, os.cpu_count() or 1)))
+# 'thread' или 'process'. bcrypt отпускает GIL, поэтому обычно достаточно потоков.
+PASSWORD_HASHER_EXECUTOR = os.environ.get("PASSWORD_HASHER_EXECUTOR", "thread")
+# Максимальная очередь ожидающих вычислений, сверх нее запросы отклоняются сразу.
+PASSWORD_HASHER_MAX_QUEUE = int(os.environ.get("PASSWORD_HASHER_MAX_QUEUE", 64))
+
 
-def make_password(password: bytes) -> str:
+class PasswordHasherBusy(Exception):
+    """Очередь к bcrypt заполнена, запрос отклонен без вычислений."""
+
+
+def make_password(password: bytes, rounds: int = BCRYPT_ROUNDS) -> str:
     """ Шифрует пароль с помощью bcrypt."""
 
     # Генерируем "соль"
-    salt = bcrypt.gensalt()
+    salt = bcrypt.gensalt(rounds=rounds)
 
     # Хешируем пароль с использованием соли и декодируем (превращаем в строку)
     hashed_password = bcrypt.hashpw(password, salt).decode()
@@ -25,3 +45,111 @@ def check_password(password: str, hashed_password: str) -> bool:
     password = password.encode()
     hashed_password = hashed_password.encode()
     return bcrypt.checkpw(password, hashed_password)
+
+
+def get_rounds(hashed_password: str) -> int:
+    """Возвращает стоимость, с которой был создан хеш вида '$2b$12$...'."""
+    return int(hashed_password.split('$')[2])
+
+
+class PasswordHasher:
+    """Выполняет bcrypt в пуле потоков/процессов, не блокируя event loop.
+
+    Количество одновременных вычислений ограничено `max_workers`, остальные запросы ждут в очереди.
+    Если в очереди уже `max_queue` запросов, новый получает PasswordHasherBusy: при перегрузке
+    лучше сразу отказать, чем заставить клиента ждать, пока он не отвалится по таймауту.
+    """
+
+    def __init__(self, max_workers: int = PASSWORD_HASHER_WORKERS, executor: str = PASSWORD_HASHER_EXECUTOR,
+                 rounds: int = BCRYPT_ROUNDS, max_queue: int = PASSWORD_HASHER_MAX_QUEUE):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"executor must be one of ('thread', 'process'), got {executor!r}")
+        self.max_workers = max_workers
+        self.executor_type = executor
+        self.rounds = rounds
+        self.max_queue = max_queue
+        self._executor: Executor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == 'process':
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='bcrypt')
+        return self._executor
+
+    async def _run(self, histogram: Histogram, func, *args):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_workers)
+        if self._semaphore.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusy()
+        start = time.perf_counter()
+        self.queued += 1
+        acquired = False
+        try:
+            async with self._semaphore:
+                self.queued -= 1
+                acquired = True
+                self.in_flight += 1
+                run_start = time.perf_counter()
+                try:
+                    loop = asyncio.get_running_loop()
+                    return await loop.run_in_executor(self._get_executor(), func, *args)
+                finally:
+                    self.in_flight -= 1
+                    histogram.observe(time.perf_counter() - run_start)
+        finally:
+            if not acquired:
+                self.queued -= 1
+            latency = time.perf_counter() - start
+            self.completed += 1
+            self.latency_total += latency
+            if latency > self.latency_max:
+                self.latency_max = latency
+
+    async def hash(self, password: str) -> str:
+        return await self._run(registry.bcrypt_seconds['hash'], make_password, password.encode(), self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(registry.bcrypt_seconds['verify'], check_password, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """True, если хеш создан с меньшей стоимостью, чем текущая."""
+        return get_rounds(hashed_password) < self.rounds
+
+    def stats(self) -> dict:
+        return {
+            'executor': self.executor_type,
+            'max_workers': self.max_workers,
+            'rounds': self.rounds,
+            'queued': self.queued,
+            'in_flight': self.in_flight,
+            'completed': self.completed,
+            'rejected': self.rejected,
+            'latency_total': self.latency_total,
+            'latency_max': self.latency_max,
+        }
+
+    async def warm_up(self):
+        """Запускает все потоки/процессы пула заранее: старт процесса занимает сотни миллисекунд,
+        и без прогрева их ждали бы первые запросы входа."""
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, get_rounds, '$2b$12$')
+                               for _ in range(self.max_workers)))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,34 @@
+from typing import AsyncIterator, Sequence
+
+from fastapi import Query
+from fastapi.responses import StreamingResponse
+from pydantic_core import to_json
+from sqlalchemy import RowMapping
+
+ExportFormatQuery = Query(default='ndjson', alias='format', pattern='^(ndjson|json)$',
+                          description='ndjson - one object per line, json - chunked JSON array')
+
+
+async def ndjson_chunks(partitions: AsyncIterator[Sequence[RowMapping]]) -> AsyncIterator[bytes]:
+    async for rows in partitions:
+        yield b''.join(to_json(dict(row)) + b'\n' for row in rows)
+
+
+async def json_array_chunks(partitions: AsyncIterator[Sequence[RowMapping]]) -> AsyncIterator[bytes]:
+    yield b'['
+    separator = b''
+    async for rows in partitions:
+        yield separator + b','.join(to_json(dict(row)) for row in rows)
+        separator = b','
+    yield b']'
+
+
+def export_response(partitions: AsyncIterator[Sequence[RowMapping]], export_format: str,
+                    filename: str) -> StreamingResponse:
+    """Отдает строки по мере чтения из базы данных, не собирая весь ответ в памяти."""
+    if export_format == 'ndjson':
+        body, media_type = ndjson_chunks(partitions), 'application/x-ndjson'
+    else:
+        body, media_type = json_array_chunks(partitions), 'application/json'
+    headers = {'Content-Disposition': f'attachment; filename="{filename}.{export_format}"'}
+    return StreamingResponse(body, media_type=media_type, headers=headers)
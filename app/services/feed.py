@@ -0,0 +1,74 @@
+import asyncio
+import hashlib
+import os
+import time
+from typing import Awaitable, Callable
+
+EVENTS_FEED_TTL = float(os.environ.get("EVENTS_FEED_TTL", 5))
+
+
+class FeedCache:
+    """Готовое (сериализованное в JSON) тело ответа, его заголовки и ETag.
+
+    Тело пересобирается только одним запросом, остальные ждут его результат.
+    В пределах процесса кеш сбрасывается через `invalidate()`, между воркерами - по истечении ttl.
+    """
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._body: bytes | None = None
+        self._headers: dict[str, str] = {}
+        self._expires_at = 0.0
+        self._version = 0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.rebuilds = 0
+
+    def invalidate(self):
+        self._version += 1
+        self._body = None
+
+    async def get(self, build: Callable[[], Awaitable[tuple[bytes, dict, float | None]]]) -> tuple[bytes, dict]:
+        """Возвращает (тело, заголовки). В заголовках всегда есть ETag.
+
+        :param build: Собирает ответ. Возвращает (тело, заголовки, через сколько секунд данные устареют или None).
+        """
+        if self._is_fresh():
+            self.hits += 1
+            return self._body, self._headers
+        async with self._lock:
+            if self._is_fresh():
+                self.hits += 1
+                return self._body, self._headers
+            version = self._version
+            body, headers, expires_in = await build()
+            headers = {**headers, 'ETag': f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'}
+            self.rebuilds += 1
+            if version == self._version:
+                # Если кеш сбросили во время сборки, результат не сохраняем - он мог устареть.
+                ttl = self.ttl if expires_in is None else min(self.ttl, expires_in)
+                self._body, self._headers = body, headers
+                self._expires_at = time.monotonic() + ttl
+            return body, headers
+
+    def _is_fresh(self) -> bool:
+        return self._body is not None and self._expires_at > time.monotonic()
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'rebuilds': self.rebuilds}
+
+
+events_feed = FeedCache(ttl=EVENTS_FEED_TTL)
+
+
+def etag_matches(etag: str, if_none_match: str | None) -> bool:
+    """Совпадает ли ETag с заголовком If-None-Match (слабое сравнение, RFC 9110 13.1.2).
+
+    Заголовок - `*` или список тегов через запятую, теги `W/"..."` сравниваются без префикса `W/`.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    etag = etag.removeprefix('W/')
+    return any(tag.strip().removeprefix('W/') == etag for tag in if_none_match.split(','))
@@ -0,0 +1,181 @@
+"""Метрики приложения в текстовом формате Prometheus.
+
+Все вычисления идут в потоке event loop, поэтому счетчики - обычные числа без блокировок.
+Серии с метками создаются один раз и хранятся в словарях, запрос не создает новых объектов меток.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Callable, Iterable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # последняя ячейка - +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: str = '') -> Iterable[str]:
+        prefix = f'{labels},' if labels else ''
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}'
+        yield f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}'
+        label_block = f'{{{labels}}}' if labels else ''
+        yield f'{name}_sum{label_block} {self.sum}'
+        yield f'{name}_count{label_block} {self.count}'
+
+
+class RouteMetrics:
+    """Серии одного маршрута: задержка по статусам ответа, количество и время SQL запросов на запрос."""
+    __slots__ = ('labels', 'latency', 'db_queries', 'db_seconds')
+
+    def __init__(self, labels: str):
+        self.labels = labels
+        self.latency: dict[int, Histogram] = {}
+        self.db_queries = Histogram(QUERY_COUNT_BUCKETS)
+        self.db_seconds = Histogram()
+
+
+class RequestStats:
+    """SQL статистика текущего запроса, накапливается хуками движка."""
+    __slots__ = ('queries', 'seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_request_stats: ContextVar[RequestStats | None] = ContextVar('request_stats', default=None)
+
+
+class Registry:
+
+    def __init__(self):
+        self.routes: dict[str, dict[str, RouteMetrics]] = {}
+        self.db_queries_total = 0
+        self.db_query_seconds = Histogram()
+        self.bcrypt_seconds = {'hash': Histogram(), 'verify': Histogram()}
+        self.jwt_seconds = {'encode': Histogram(), 'decode': Histogram()}
+        self.collectors: list[Callable[[], dict[str, float]]] = []
+
+    def route(self, method: str, path: str) -> RouteMetrics:
+        by_method = self.routes.get(path)
+        if by_method is None:
+            by_method = self.routes[path] = {}
+        metrics = by_method.get(method)
+        if metrics is None:
+            metrics = by_method[method] = RouteMetrics(f'method="{method}",route="{path}"')
+        return metrics
+
+    def _all_routes(self) -> Iterable[RouteMetrics]:
+        for by_method in self.routes.values():
+            yield from by_method.values()
+
+    def add_collector(self, prefix: str, collect: Callable[[], dict]):
+        """Добавляет gauge метрики `<prefix>_<ключ>`, значения читаются при каждом запросе /metrics."""
+        self.collectors.append(lambda: {f'{prefix}_{key}': value for key, value in collect().items()
+                                        if isinstance(value, (int, float))})
+
+    def render(self) -> str:
+        lines = ['# TYPE http_request_duration_seconds histogram']
+        for route in self._all_routes():
+            for status_code, histogram in route.latency.items():
+                lines.extend(histogram.render('http_request_duration_seconds',
+                                              f'{route.labels},status="{status_code}"'))
+        lines.append('# TYPE http_request_db_queries histogram')
+        for route in self._all_routes():
+            lines.extend(route.db_queries.render('http_request_db_queries', route.labels))
+        lines.append('# TYPE http_request_db_seconds histogram')
+        for route in self._all_routes():
+            lines.extend(route.db_seconds.render('http_request_db_seconds', route.labels))
+
+        lines.append('# TYPE db_queries_total counter')
+        lines.append(f'db_queries_total {self.db_queries_total}')
+        lines.append('# TYPE db_query_duration_seconds histogram')
+        lines.extend(self.db_query_seconds.render('db_query_duration_seconds'))
+        lines.append('# TYPE bcrypt_duration_seconds histogram')
+        for operation, histogram in self.bcrypt_seconds.items():
+            lines.extend(histogram.render('bcrypt_duration_seconds', f'operation="{operation}"'))
+        lines.append('# TYPE jwt_duration_seconds histogram')
+        for operation, histogram in self.jwt_seconds.items():
+            lines.extend(histogram.render('jwt_duration_seconds', f'operation="{operation}"'))
+
+        for collect in self.collectors:
+            for name, value in collect().items():
+                lines.append(f'# TYPE {name} gauge')
+                lines.append(f'{name} {float(value)}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class MetricsMiddleware:
+    """ASGI middleware: задержка и количество SQL запросов для каждого маршрута."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message['type'] == 'http.response.start':
+                status_code = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            _request_stats.reset(token)
+            # Метка - шаблон пути маршрута, а не сам путь, чтобы количество серий не зависело от id в URL.
+            route = scope.get('route')
+            metrics = registry.route(scope['method'], route.path if route is not None else '<unmatched>')
+            histogram = metrics.latency.get(status_code)
+            if histogram is None:
+                histogram = metrics.latency[status_code] = Histogram()
+            histogram.observe(elapsed)
+            metrics.db_queries.observe(stats.queries)
+            metrics.db_seconds.observe(stats.seconds)
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Подключает к движку подсчет SQL запросов: общий и для текущего HTTP запроса."""
+
+    @event.listens_for(engine.sync_engine, 'before_cursor_execute')
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        context._query_start = time.perf_counter()
+
+    @event.listens_for(engine.sync_engine, 'after_cursor_execute')
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_start
+        registry.db_queries_total += 1
+        registry.db_query_seconds.observe(elapsed)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.seconds += elapsed
@@ -0,0 +1,54 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Sequence
+
+from fastapi import HTTPException, Query
+from starlette import status
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+NEXT_CURSOR_HEADER = 'X-Next-Cursor'
+
+InvalidCursorException = HTTPException(
+    status_code=status.HTTP_400_BAD_REQUEST,
+    detail="Invalid cursor",
+)
+
+
+class PageParams:
+    """Параметры keyset-пагинации: курсор последней полученной записи и размер страницы."""
+
+    def __init__(self, cursor: str | None = Query(default=None),
+                 limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)):
+        self.cursor = cursor
+        self.limit = limit
+
+    @property
+    def is_default(self) -> bool:
+        return self.cursor is None and self.limit == DEFAULT_PAGE_SIZE
+
+
+def encode_cursor(*values: Any) -> str:
+    """Кодирует ключ сортировки последней записи страницы в непрозрачную строку."""
+    raw = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str, *types: Callable[[Any], Any]) -> tuple:
+    """Обратное `encode_cursor` преобразование. `types` приводят значения к нужным типам."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if len(values) != len(types):
+            raise ValueError(cursor)
+        return tuple(cast(value) for cast, value in zip(types, values))
+    except (ValueError, TypeError):
+        raise InvalidCursorException
+
+
+def split_page(rows: Sequence, limit: int, key: Callable[[Any], tuple]) -> tuple[list, str | None]:
+    """Принимает до `limit + 1` записей, возвращает страницу и курсор следующей страницы (или None)."""
+    page = list(rows[:limit])
+    if len(rows) > limit:
+        return page, encode_cursor(*key(page[-1]))
+    return page, None
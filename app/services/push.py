@@ -0,0 +1,176 @@
+"""Рассылка изменений событий клиентам (SSE и WebSocket) вместо опроса GET /api/events.
+
+Сообщение сериализуется один раз при публикации, подписчики получают одни и те же байты.
+У каждого подписчика своя ограниченная очередь: если клиент не успевает читать и очередь
+заполнилась, он отключается и при переподключении заново загружает ленту.
+"""
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from typing import Any, AsyncIterator, Callable
+
+from pydantic_core import to_json, from_json
+
+# Размер очереди одного подписчика, переполнение - отключение медленного клиента.
+PUSH_QUEUE_SIZE = int(os.environ.get("PUSH_QUEUE_SIZE", 256))
+# Интервал комментариев-пингов SSE, чтобы прокси не закрывали простаивающее соединение.
+PUSH_HEARTBEAT = float(os.environ.get("PUSH_HEARTBEAT", 15))
+
+
+class Message:
+    """Сообщение в двух готовых видах: JSON для WebSocket и кадр SSE."""
+    __slots__ = ('data', 'sse')
+
+    def __init__(self, data: bytes):
+        self.data = data
+        self.sse = b'data: ' + data + b'\n\n'
+
+
+class PushBroker(ABC):
+    """Доставка сообщений всем воркерам. Межпроцессная (например, Redis pub/sub) реализуется наследованием:
+    `publish` отправляет сообщение в канал, а подписка на канал вызывает `deliver` в каждом воркере."""
+    # True, если сообщения доходят до всех воркеров. Только тогда кеши процесса могут обновляться сообщениями.
+    shared: bool = False
+
+    @abstractmethod
+    async def start(self, deliver: Callable[[bytes], Any]):
+        ...
+
+    @abstractmethod
+    async def publish(self, data: bytes):
+        ...
+
+    @abstractmethod
+    async def stop(self):
+        ...
+
+
+class LocalPushBroker(PushBroker):
+    """Доставка внутри одного процесса. Используется по умолчанию и при одном воркере."""
+
+    def __init__(self):
+        self._deliver: Callable[[bytes], Any] | None = None
+
+    async def start(self, deliver: Callable[[bytes], Any]):
+        self._deliver = deliver
+
+    async def publish(self, data: bytes):
+        if self._deliver is not None:
+            self._deliver(data)
+
+    async def stop(self):
+        self._deliver = None
+
+
+class PushHub:
+    """Раздает сообщения брокера очередям подписчиков текущего процесса.
+
+    Брокер можно заменить до старта приложения: `push_hub.broker = MyRedisBroker(...)`.
+    """
+
+    def __init__(self, broker: PushBroker, queue_size: int = PUSH_QUEUE_SIZE):
+        self.broker = broker
+        self.queue_size = queue_size
+        self._subscribers: set[asyncio.Queue] = set()
+        self._listeners: list[Callable[[dict], Any]] = []
+        self._started = False
+        # Сервер останавливается: новые потоки сразу закрываются.
+        self._closing = False
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def start(self):
+        await self.broker.start(self._deliver)
+        self._started = True
+        self._closing = False
+
+    async def stop(self):
+        """Останавливает брокер и завершает потоки всех подписчиков."""
+        await self.broker.stop()
+        self._started = False
+        self.close_streams()
+
+    def close_streams(self):
+        """Завершает потоки всех подписчиков, брокер продолжает работать. Вызывается, когда сервер
+        начинает остановку: он ждет закрытия соединений, а поток сам не заканчивается."""
+        self._closing = True
+        for queue in list(self._subscribers):
+            self._close(queue)
+
+    async def publish(self, message: dict):
+        self.published += 1
+        if self._started:
+            await self.broker.publish(to_json(message))
+        else:
+            # Брокер еще не запущен (например, скрипт без старта приложения) - доставляем внутри процесса.
+            self._deliver(to_json(message))
+
+    def add_listener(self, listener: Callable[[dict], Any]):
+        """Обработчик каждого сообщения брокера внутри процесса, включая сообщения других воркеров."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[dict], Any]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Очередь сообщений для нового клиента. None в очереди - поток закрыт, клиенту нужно переподключиться."""
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        if self._closing:
+            self._close(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def _deliver(self, data: bytes):
+        if self._listeners:
+            payload = from_json(data)
+            for listener in self._listeners:
+                listener(payload)
+        message = Message(data)
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(message)
+                self.delivered += 1
+            except asyncio.QueueFull:
+                self.dropped += 1
+                self._close(queue)
+
+    def _close(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+        # Недоставленные сообщения клиенту уже не помогут, освобождаем место под маркер закрытия.
+        while not queue.empty():
+            queue.get_nowait()
+        queue.put_nowait(None)
+
+    async def listen(self, encode: Callable[[Message], bytes | str],
+                     heartbeat: bytes | str | None = None) -> AsyncIterator[bytes | str]:
+        """Асинхронный генератор сообщений одного клиента с пингами раз в PUSH_HEARTBEAT секунд."""
+        queue = self.subscribe()
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), PUSH_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    if heartbeat is not None:
+                        yield heartbeat
+                    continue
+                if message is None:
+                    return
+                yield encode(message)
+        finally:
+            self.unsubscribe(queue)
+
+    def stats(self) -> dict:
+        return {
+            'subscribers': len(self._subscribers),
+            'published': self.published,
+            'delivered': self.delivered,
+            'dropped': self.dropped,
+        }
+
+
+push_hub = PushHub(LocalPushBroker())
@@ -0,0 +1,122 @@
+"""Ограничение частоты запросов алгоритмом token bucket.
+
+Корзина ключа - пара (токены, время обновления): токены пополняются со скоростью `rate` в секунду
+до `burst`, каждый запрос забирает один токен. Пустая корзина - ответ 429 с Retry-After.
+"""
+import math
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request
+from starlette import status
+
+RATE_LIMIT_ENABLED = os.environ.get("RATE_LIMIT_ENABLED", "1").lower() not in ("0", "false", "no")
+# Максимальное количество корзин в памяти, дольше всего не использованные вытесняются.
+RATE_LIMIT_SIZE = int(os.environ.get("RATE_LIMIT_SIZE", 100_000))
+# Брать адрес клиента из X-Forwarded-For (только за доверенным прокси).
+RATE_LIMIT_TRUST_PROXY = os.environ.get("RATE_LIMIT_TRUST_PROXY", "0").lower() in ("1", "true", "yes")
+# Скорость пополнения (запросов в секунду) и размер корзины для каждого ограничения.
+LOGIN_IP_RATE = float(os.environ.get("LOGIN_IP_RATE", 1.0))
+LOGIN_IP_BURST = int(os.environ.get("LOGIN_IP_BURST", 20))
+LOGIN_USERNAME_RATE = float(os.environ.get("LOGIN_USERNAME_RATE", 0.1))
+LOGIN_USERNAME_BURST = int(os.environ.get("LOGIN_USERNAME_BURST", 5))
+REGISTER_IP_RATE = float(os.environ.get("REGISTER_IP_RATE", 0.2))
+REGISTER_IP_BURST = int(os.environ.get("REGISTER_IP_BURST", 10))
+
+# Ответ при перегрузке: очередь к bcrypt заполнена (PasswordHasherBusy).
+ServerBusyException = HTTPException(
+    status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+    detail="Server is busy, try again later",
+    headers={"Retry-After": "1"},
+)
+
+
+class RateLimitBackend(ABC):
+    """Хранилище корзин. Общее для нескольких воркеров (например, Redis со скриптом Lua) реализуется
+    наследованием: `acquire` должен выполняться атомарно."""
+
+    @abstractmethod
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        """Забирает токен из корзины `key`. Возвращает 0, если токен получен, иначе - сколько секунд ждать."""
+
+
+class LocalRateLimitBackend(RateLimitBackend):
+    """Корзины в памяти процесса, LRU с ограничением размера."""
+
+    def __init__(self, maxsize: int = RATE_LIMIT_SIZE):
+        self.maxsize = maxsize
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            tokens = float(burst)
+        else:
+            tokens, updated = bucket
+            tokens = min(float(burst), tokens + (now - updated) * rate)
+
+        if tokens >= 1:
+            tokens -= 1
+            wait = 0.0
+        else:
+            wait = (1 - tokens) / rate
+
+        self._buckets[key] = (tokens, now)
+        self._buckets.move_to_end(key)
+        if len(self._buckets) > self.maxsize:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def __len__(self):
+        return len(self._buckets)
+
+
+def client_ip(request: Request) -> str:
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get('x-forwarded-for')
+        if forwarded:
+            return forwarded.split(',', 1)[0].strip()
+    return request.client.host if request.client else 'unknown'
+
+
+class RateLimiter:
+    """Именованное ограничение поверх `RateLimitBackend` со счетчиками.
+
+    Хранилище можно заменить в любой момент: `limiter.backend = MyRedisBackend(...)`.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, backend: RateLimitBackend):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.backend = backend
+        self.allowed = 0
+        self.limited = 0
+
+    async def hit(self, key: str):
+        """Забирает токен для `key`, при пустой корзине - HTTPException 429 с Retry-After."""
+        if not RATE_LIMIT_ENABLED:
+            return
+        wait = await self.backend.acquire(f'{self.name}:{key}', self.rate, self.burst)
+        if wait > 0:
+            self.limited += 1
+            raise HTTPException(status_code=status.HTTP_429_TOO_MANY_REQUESTS, detail='Too many requests',
+                                headers={'Retry-After': str(math.ceil(wait))})
+        self.allowed += 1
+
+    async def by_ip(self, request: Request):
+        """Зависимость FastAPI: ограничение по адресу клиента."""
+        await self.hit(client_ip(request))
+
+    def stats(self) -> dict:
+        return {'allowed': self.allowed, 'limited': self.limited}
+
+
+rate_limit_backend = LocalRateLimitBackend()
+login_ip_limiter = RateLimiter('login_ip', LOGIN_IP_RATE, LOGIN_IP_BURST, rate_limit_backend)
+login_username_limiter = RateLimiter('login_username', LOGIN_USERNAME_RATE, LOGIN_USERNAME_BURST,
+                                     rate_limit_backend)
+register_ip_limiter = RateLimiter('register_ip', REGISTER_IP_RATE, REGISTER_IP_BURST, rate_limit_backend)
@@ -0,0 +1,24 @@
+from typing import Any
+
+from fastapi.responses import JSONResponse, Response
+from pydantic import TypeAdapter
+
+try:
+    from fastapi.responses import ORJSONResponse
+    import orjson  # noqa: F401 - ORJSONResponse импортирует orjson только при отрисовке ответа
+except ImportError:
+    ORJSONResponse = None
+
+# Класс ответа по умолчанию для всего приложения: orjson, если установлен.
+DefaultJSONResponse = ORJSONResponse or JSONResponse
+
+
+def json_response(adapter: TypeAdapter, content: Any, status_code: int = 200,
+                  headers: dict[str, str] | None = None) -> Response:
+    """Проверяет `content` по схеме ответа и сериализует одним проходом pydantic-core.
+
+    Обработчики, которые возвращают такой ответ, минуют повторную проверку по response_model
+    и jsonable_encoder. Лишние ключи (например, id) отбрасываются схемой, как и при response_model.
+    """
+    body = adapter.dump_json(adapter.validate_python(content))
+    return Response(content=body, status_code=status_code, media_type='application/json', headers=headers)
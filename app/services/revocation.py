@@ -0,0 +1,89 @@
+import heapq
+import time
+from abc import ABC, abstractmethod
+
+
+class RevocationBackend(ABC):
+    """Множество отозванных идентификаторов токенов (jti).
+
+    Запись нужна только до истечения самого токена, после этого токен отклоняется по 'exp'.
+    Общее для нескольких воркеров хранилище (например, Redis с SET NX EX) реализуется наследованием.
+    """
+
+    @abstractmethod
+    async def revoke(self, jti: str, ttl: float) -> bool:
+        """Отзывает jti на `ttl` секунд. Возвращает False, если jti уже был отозван."""
+
+    @abstractmethod
+    async def is_revoked(self, jti: str) -> bool:
+        ...
+
+
+class LocalRevocationBackend(RevocationBackend):
+    """Отозванные jti в памяти процесса: словарь jti -> срок и куча сроков для очистки.
+
+    В отличие от LRU-кеша записи не вытесняются по размеру, иначе отозванный токен снова стал бы
+    действительным. Размер ограничен количеством обновлений за время жизни refresh токена.
+    """
+
+    def __init__(self):
+        self._expires: dict[str, float] = {}
+        self._heap: list[tuple[float, str]] = []
+
+    def _prune(self, now: float):
+        heap = self._heap
+        while heap and heap[0][0] <= now:
+            expires_at, jti = heapq.heappop(heap)
+            if self._expires.get(jti) == expires_at:
+                del self._expires[jti]
+
+    async def revoke(self, jti: str, ttl: float) -> bool:
+        now = time.monotonic()
+        self._prune(now)
+        if jti in self._expires:
+            return False
+        expires_at = now + ttl
+        self._expires[jti] = expires_at
+        heapq.heappush(self._heap, (expires_at, jti))
+        return True
+
+    async def is_revoked(self, jti: str) -> bool:
+        expires_at = self._expires.get(jti)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def __len__(self):
+        return len(self._expires)
+
+
+class RevocationList:
+    """Отозванные токены поверх `RevocationBackend` со счетчиками.
+
+    Хранилище можно заменить в любой момент: `revoked_tokens.backend = MyRedisBackend(...)`.
+    """
+
+    def __init__(self, backend: RevocationBackend):
+        self.backend = backend
+        self.revoked = 0
+        self.reused = 0
+
+    async def revoke(self, jti: str, ttl: float) -> bool:
+        if ttl <= 0:
+            return True
+        revoked = await self.backend.revoke(jti, ttl)
+        if revoked:
+            self.revoked += 1
+        else:
+            self.reused += 1
+        return revoked
+
+    async def is_revoked(self, jti: str) -> bool:
+        return await self.backend.is_revoked(jti)
+
+    def stats(self) -> dict:
+        stats = {'revoked': self.revoked, 'reused': self.reused}
+        if isinstance(self.backend, LocalRevocationBackend):
+            stats['size'] = len(self.backend)
+        return stats
+
+
+revoked_tokens = RevocationList(LocalRevocationBackend())
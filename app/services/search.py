@@ -0,0 +1,58 @@
+"""Полнотекстовый поиск по названию и описанию событий.
+
+SQLite: внешняя (content='events') таблица FTS5 events_fts, синхронизируется триггерами.
+PostgreSQL: GIN индекс по выражению SEARCH_VECTOR_SQL, отдельная колонка и триггеры не нужны.
+Запрос пользователя разбивается на слова, ищутся события, содержащие все слова (как префиксы).
+Ранжируются только SEARCH_MAX_CANDIDATES самых новых совпадений в нужном интервале времени.
+Миграция 0006 создает те же объекты - при изменении DDL нужна новая миграция.
+"""
+import os
+import re
+
+# Максимальное количество слов из запроса, остальные отбрасываются.
+MAX_SEARCH_TERMS = 8
+# Сколько совпадений (самых новых по id) ранжируется. Ограничивает время запроса для частых слов:
+# вычисление релевантности всех совпадений стоит O(количество совпадений).
+SEARCH_MAX_CANDIDATES = int(os.environ.get("SEARCH_MAX_CANDIDATES", 5000))
+# Вес совпадения в названии относительно описания.
+TITLE_WEIGHT = 10.0
+
+SQLITE_FTS_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5("
+    "title, description, content='events', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS events_fts_insert AFTER INSERT ON events BEGIN "
+    "INSERT INTO events_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS events_fts_delete AFTER DELETE ON events BEGIN "
+    "INSERT INTO events_fts(events_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS events_fts_update AFTER UPDATE OF title, description ON events BEGIN "
+    "INSERT INTO events_fts(events_fts, rowid, title, description) "
+    "VALUES ('delete', old.id, old.title, old.description); "
+    "INSERT INTO events_fts(rowid, title, description) VALUES (new.id, new.title, new.description); END",
+)
+
+# Выражение должно совпадать с выражением индекса ix_events_search, иначе PostgreSQL не использует индекс.
+SEARCH_VECTOR_SQL = ("(setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                     "setweight(to_tsvector('simple', coalesce(description, '')), 'B'))")
+
+POSTGRES_SEARCH_DDL = (
+    f"CREATE INDEX IF NOT EXISTS ix_events_search ON events USING gin ({SEARCH_VECTOR_SQL})",
+)
+
+_WORD = re.compile(r'\w+')
+
+
+def search_terms(text: str) -> list[str]:
+    """Слова запроса в нижнем регистре, без повторов. Знаки препинания и операторы отбрасываются."""
+    return list(dict.fromkeys(word.lower() for word in _WORD.findall(text)))[:MAX_SEARCH_TERMS]
+
+
+def fts5_query(terms: list[str]) -> str:
+    """Запрос MATCH для FTS5: все слова как префиксы. Кавычки экранируют слова от синтаксиса FTS5."""
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def tsquery(terms: list[str]) -> str:
+    """Запрос to_tsquery для PostgreSQL: все слова как префиксы."""
+    return ' & '.join(f"'{term}':*" for term in terms)
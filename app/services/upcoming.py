@@ -0,0 +1,220 @@
+"""Индекс предстоящих событий в памяти процесса.
+
+Отсортированный по (meeting_time, id) список ключей и строки событий по id. Страница ленты
+находится бинарным поиском без запроса к базе. Прошедшие события отбрасываются с начала списка
+при каждом обращении. Изменения приходят сообщениями push_hub, поэтому индекс запускается с общим
+для всех воркеров брокером или явно для одного воркера (см. AppSettings.upcoming_index), иначе лента
+читается из базы. Фоновая задача каждые EVENTS_FEED_TTL секунд сравнивает max(id) событий
+с известным индексу и перезагружает его, если событие добавлено в обход приложения, а раз
+в UPCOMING_INDEX_REFRESH секунд - в любом случае.
+"""
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_left, bisect_right, insort
+from contextlib import suppress
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+from database.types import as_utc
+from .feed import EVENTS_FEED_TTL
+
+logger = logging.getLogger(__name__)
+
+# Максимальное количество событий в индексе, более поздние события читаются из базы.
+UPCOMING_INDEX_SIZE = int(os.environ.get("UPCOMING_INDEX_SIZE", 50_000))
+# Интервал полной перезагрузки индекса, исправляет изменения, сделанные в обход приложения.
+UPCOMING_INDEX_REFRESH = float(os.environ.get("UPCOMING_INDEX_REFRESH", 300))
+
+Key = tuple[datetime, int]
+
+
+class UpcomingIndex:
+    """Индекс отвечает на запросы только после `start` и пока фоновая проверка выполняется вовремя."""
+
+    def __init__(self, maxsize: int = UPCOMING_INDEX_SIZE, refresh_interval: float = UPCOMING_INDEX_REFRESH,
+                 check_interval: float = EVENTS_FEED_TTL):
+        self.maxsize = maxsize
+        self.refresh_interval = refresh_interval
+        self.check_interval = check_interval
+        self._keys: list[Key] = []
+        self._rows: dict[int, dict] = {}
+        # Индекс полон для ключей меньше горизонта. None - в индексе все предстоящие события.
+        self._horizon: Key | None = None
+        self._loaded_at: float | None = None
+        # Время последней успешной проверки. Если проверки не выполняются, индекс перестает отвечать.
+        self._checked_at: float | None = None
+        # Наибольший id события, о котором индекс знает (из базы или из сообщений).
+        self._last_id: int | None = None
+        # Сообщения, пришедшие во время загрузки, применяются поверх загруженного снимка.
+        self._pending: list[dict] | None = None
+        self._load: Callable[[int], Awaitable[list[dict]]] | None = None
+        self._get_last_id: Callable[[], Awaitable[int | None]] | None = None
+        self._task: asyncio.Task | None = None
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+        self.errors = 0
+
+    async def start(self, load: Callable[[int], Awaitable[list[dict]]],
+                    get_last_id: Callable[[], Awaitable[int | None]]):
+        """Загружает индекс и запускает фоновую проверку.
+
+        :param load: Возвращает до `limit` ближайших предстоящих событий в порядке (meeting_time, id).
+        :param get_last_id: Возвращает max(id) всех событий.
+        """
+        if self._task is not None:
+            return
+        self._load, self._get_last_id = load, get_last_id
+        await self._check()
+        self._task = asyncio.create_task(self._run(), name='upcoming-index')
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            with suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+        self._loaded_at = self._checked_at = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self._check()
+
+    async def _check(self):
+        try:
+            checked_at = time.monotonic()
+            last_id = await self._get_last_id()
+            if (self._loaded_at is None or last_id != self._last_id
+                    or checked_at - self._loaded_at >= self.refresh_interval):
+                await self._reload(last_id)
+            self._checked_at = checked_at
+        except Exception:
+            # Лучше отвечать из базы, чем из снимка неизвестной давности.
+            self.errors += 1
+            self._loaded_at = self._checked_at = None
+            logger.exception('Upcoming events index check failed')
+
+    async def _reload(self, last_id: int | None):
+        """Загружает новый снимок. Пока он загружается, запросы обслуживает предыдущий."""
+        self._pending = []
+        try:
+            rows = await self._load(self.maxsize + 1)
+            self._keys, self._rows, self._horizon = [], {}, None
+            for row in rows:
+                self._keys.append(self._key(row))
+                self._rows[row['id']] = row
+            if len(self._keys) > self.maxsize:
+                self._drop_last()
+            self._last_id = last_id
+            self._loaded_at = time.monotonic()
+            self.reloads += 1
+            pending, self._pending = self._pending, None
+            for message in pending:
+                self.on_message(message)
+        finally:
+            self._pending = None
+
+    def _is_current(self) -> bool:
+        return (self._loaded_at is not None and self._checked_at is not None
+                and time.monotonic() - self._checked_at <= 2 * self.check_interval)
+
+    def page(self, limit: int, after: Key | None = None, start: datetime | None = None,
+             end: datetime | None = None) -> list[dict] | None:
+        """До `limit` событий после `after` в интервале [start, end) или None, если индекс не может
+        ответить полностью (не загружен, давно не проверялся или страница выходит за горизонт)."""
+        if not self._is_current():
+            self.misses += 1
+            return None
+        now = datetime.now(timezone.utc)
+        self._prune(now)
+        if start is not None and as_utc(start) < now:
+            self.misses += 1
+            return None
+
+        if after is not None:
+            first = bisect_right(self._keys, (as_utc(after[0]), after[1]))
+        else:
+            first = 0
+        if start is not None:
+            first = max(first, bisect_left(self._keys, (as_utc(start), 0)))
+        last = len(self._keys) if end is None else bisect_left(self._keys, (as_utc(end), 0))
+        keys = self._keys[first:min(first + limit, last)]
+
+        if len(keys) < limit and self._horizon is not None and (end is None or (as_utc(end), 0) > self._horizon):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [dict(self._rows[event_id]) for _, event_id in keys]
+
+    def on_message(self, message: dict):
+        """Обработчик сообщений push_hub: созданные события и новые количества подписчиков."""
+        if self._pending is not None:
+            self._pending.append(message)
+        if message['type'] == 'events_created':
+            now = datetime.now(timezone.utc)
+            for row in message['events']:
+                self.add(row, now)
+                if self._last_id is None or row['id'] > self._last_id:
+                    self._last_id = row['id']
+        elif message['type'] == 'subscription':
+            row = self._rows.get(message['event_id'])
+            if row is not None:
+                row['subscriber_count'] = message['subscriber_count']
+
+    def add(self, row: dict, now: datetime | None = None):
+        meeting_time = row['meeting_time']
+        if isinstance(meeting_time, str):
+            meeting_time = datetime.fromisoformat(meeting_time)
+        row = {**row, 'meeting_time': as_utc(meeting_time)}
+        key = self._key(row)
+        if key[0] <= (now or datetime.now(timezone.utc)):
+            return
+        if self._horizon is not None and key >= self._horizon:
+            return
+        self.remove(row['id'])
+        insort(self._keys, key)
+        self._rows[row['id']] = row
+        if len(self._keys) > self.maxsize:
+            self._drop_last()
+
+    def remove(self, event_id: int):
+        row = self._rows.pop(event_id, None)
+        if row is not None:
+            key = self._key(row)
+            del self._keys[bisect_left(self._keys, key)]
+
+    def _drop_last(self):
+        while len(self._keys) > self.maxsize:
+            key = self._keys.pop()
+            del self._rows[key[1]]
+            self._horizon = key
+
+    def _prune(self, now: datetime):
+        """Отбрасывает события, которые уже начались."""
+        count = bisect_right(self._keys, (now, float('inf')))
+        if count:
+            for _, event_id in self._keys[:count]:
+                del self._rows[event_id]
+            del self._keys[:count]
+
+    @staticmethod
+    def _key(row: dict) -> Key:
+        return row['meeting_time'], row['id']
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            'size': len(self._keys),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / total if total else 0.0,
+            'reloads': self.reloads,
+            'errors': self.errors,
+        }
+
+
+upcoming_events = UpcomingIndex()
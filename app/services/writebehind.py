@@ -0,0 +1,150 @@
+"""Групповая запись: изменения из многих запросов применяются одной транзакцией.
+
+Запрос кладет операцию в очередь и ждет свою future. Фоновая задача забирает из очереди до
+`max_batch` операций (ожидая следующие не дольше `max_delay` секунд), применяет их одной
+транзакцией с одним commit и раздает каждому запросу его результат или исключение.
+"""
+import asyncio
+import contextvars
+import os
+from typing import Any, Awaitable, Callable, Hashable
+
+# Включает групповую запись подписок. По умолчанию каждый запрос делает свой commit.
+SUBSCRIPTION_WRITE_BEHIND = os.environ.get("SUBSCRIPTION_WRITE_BEHIND", "0").lower() in ("1", "true", "yes")
+# Максимальное количество операций в одной транзакции.
+SUBSCRIPTION_BATCH_SIZE = int(os.environ.get("SUBSCRIPTION_BATCH_SIZE", 500))
+# Сколько секунд собирать пакет после первой операции. 0 - брать только то, что уже в очереди:
+# пакеты складываются сами, пока выполняется предыдущий commit.
+SUBSCRIPTION_BATCH_DELAY = float(os.environ.get("SUBSCRIPTION_BATCH_DELAY", 0))
+# Размер очереди. Когда она заполнена, новые запросы ждут места (обратное давление).
+SUBSCRIPTION_QUEUE_SIZE = int(os.environ.get("SUBSCRIPTION_QUEUE_SIZE", 10_000))
+
+_STOP = object()
+
+
+class GroupCommitQueue:
+    """Очередь операций с фоновым применением пакетами.
+
+    :param apply: Применяет пакет операций одной транзакцией. Возвращает результат для каждой операции
+                  в том же порядке; исключение в списке - ошибка только этой операции.
+    """
+
+    def __init__(self, apply: Callable[[list[Hashable]], Awaitable[list[Any]]], enabled: bool,
+                 max_batch: int, max_delay: float, max_queue: int):
+        self.apply = apply
+        self.enabled = enabled
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_queue = max_queue
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._draining = False
+        self.batches = 0
+        self.operations = 0
+        self.max_batch_seen = 0
+        self.waiting = 0
+
+    @property
+    def accepting(self) -> bool:
+        """True, если операции нужно отправлять в очередь, а не применять сразу."""
+        return self.enabled and not self._draining
+
+    def start(self):
+        """Запускает фоновую задачу. Вызывается при старте приложения, `submit` запускает ее сам,
+        если очередь остановлена."""
+        if self._task is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+            # Пустой контекст: задача не наследует contextvars запроса, который ее запустил,
+            # иначе запросы всех пакетов попадали бы в статистику этого запроса.
+            self._task = asyncio.create_task(self._run(), name='group-commit', context=contextvars.Context())
+
+    async def submit(self, operation: Hashable) -> Any:
+        """Ставит операцию в очередь и ждет ее результат."""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self.waiting += 1
+        try:
+            await self._queue.put((operation, future))
+            return await future
+        finally:
+            self.waiting -= 1
+
+    async def drain(self):
+        """Прекращает прием операций, применяет уже поставленные и останавливает фоновую задачу."""
+        if self._task is None:
+            return
+        self._draining = True
+        try:
+            await self._queue.put(_STOP)
+            await self._task
+            # Операции, поставленные в заполненную очередь позже маркера остановки.
+            leftovers = []
+            while not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is not _STOP:
+                    leftovers.append(item)
+            if leftovers:
+                await self._flush(leftovers)
+        finally:
+            self._task = self._queue = None
+            self._draining = False
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stop = False
+        while not stop:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = loop.time() + self.max_delay
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[Hashable, asyncio.Future]]):
+        operations = [operation for operation, _ in batch]
+        try:
+            results = await self.apply(operations)
+        except Exception:
+            # Ошибка всей транзакции: применяем операции по одной, чтобы она досталась только виновнику.
+            results = []
+            for operation in operations:
+                try:
+                    results.extend(await self.apply([operation]))
+                except Exception as exc:
+                    results.append(exc)
+
+        self.batches += 1
+        self.operations += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue  # запрос отменен, операция все равно применена
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            'enabled': int(self.enabled),
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'waiting': self.waiting,
+            'batches': self.batches,
+            'operations': self.operations,
+            'max_batch_seen': self.max_batch_seen,
+        }
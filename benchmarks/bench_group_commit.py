@@ -0,0 +1,99 @@
+"""Подписка/отписка: commit на каждый запрос против групповой записи (SUBSCRIPTION_WRITE_BEHIND).
+
+Каждый из `concurrency` воркеров подписывает и отписывает случайного пользователя на случайное
+событие через Event.add_user_or_remove. Считаются операции и commit в секунду и задержка операции.
+`--journal delete` отключает WAL - тогда каждый commit делает fsync, как у SQLite по умолчанию.
+
+Запуск: python -m benchmarks.bench_group_commit --operations 5000 --concurrency 1,50,200
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))]
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=100)
+    parser.add_argument('--operations', type=int, default=5000, help='Operations per mode and concurrency level')
+    parser.add_argument('--concurrency', default='1,50,200')
+    parser.add_argument('--journal', choices=('wal', 'delete'), default='wal')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    from sqlalchemy import event, insert
+    from database.base import Base, init_db
+    from database.connector import db_conn
+    from app.models import User, Event, subscription_writes
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'group_commit.sqlite3')
+    await init_db(dsn=f'sqlite+aiosqlite:///{db_path}', echo=False, sqlite_wal=args.journal == 'wal')
+    async with db_conn.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(User), [{'username': f'user{i}', 'email': f'user{i}@example.com',
+                                                 'password': 'x'} for i in range(args.users)])
+        now = datetime.now(timezone.utc)
+        await connection.execute(insert(Event), [{'title': f'Event {i}', 'description': 'd',
+                                                  'meeting_time': now + timedelta(days=1)} for i in range(args.events)])
+
+    commits = 0
+
+    @event.listens_for(db_conn.engine.sync_engine, 'commit')
+    def count_commit(connection):
+        nonlocal commits
+        commits += 1
+
+    async def run(concurrency: int) -> dict:
+        nonlocal commits
+        from sqlalchemy.exc import OperationalError
+        latencies: list[float] = []
+        errors = 0
+        operations = iter(range(args.operations // 2))
+
+        async def worker():
+            nonlocal errors
+            for _ in operations:
+                event_id, user_id = rng.randint(1, args.events), rng.randint(1, args.users)
+                for action in ('add', 'remove'):
+                    start = time.perf_counter()
+                    try:
+                        await Event.add_user_or_remove(event_id, user_id, action)
+                    except OperationalError:
+                        errors += 1  # database is locked: писатель не дождался блокировки за busy_timeout
+                    finally:
+                        latencies.append(time.perf_counter() - start)
+
+        commits = 0
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return {
+            'ops_per_sec': round(len(latencies) / elapsed),
+            'commits_per_sec': round(commits / elapsed),
+            'ops_per_commit': round(len(latencies) / max(commits, 1), 1),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+            'errors': errors,
+        }
+
+    print(f'journal={args.journal}, {args.operations} operations per run')
+    for concurrency in (int(level) for level in args.concurrency.split(',')):
+        for mode in ('direct', 'write-behind'):
+            subscription_writes.enabled = mode == 'write-behind'
+            result = await run(concurrency)
+            await subscription_writes.drain()
+            print(f'concurrency {concurrency:>4} {mode:>12}: ' + '  '.join(f'{k} {v}' for k, v in result.items()))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,39 @@
+"""Сравнение проверки access токена с кешем и без него.
+
+Запуск: python -m benchmarks.bench_jwt [--iterations 50000]
+"""
+import argparse
+import json
+import time
+
+from app.services import auth
+
+
+def bench(func, token: str, iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func(token, 'access')
+    return iterations / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--iterations', type=int, default=50_000)
+    args = parser.parse_args()
+
+    access, _ = auth.create_jwt_token_pair('1')
+    uncached = bench(auth.decode_token, access, args.iterations)
+    auth.verified_tokens.clear()
+    cached = bench(auth.get_token_payload, access, args.iterations)
+
+    print(json.dumps({
+        'iterations': args.iterations,
+        'uncached_ops_per_sec': round(uncached),
+        'cached_ops_per_sec': round(cached),
+        'speedup': round(cached / uncached, 1),
+        'cache': auth.verified_tokens.stats(),
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Накладные расходы Manager: построение запроса на каждый вызов против подготовленного, N+1 против get_many.
+
+1. Только Python: построение select и вычисление ключа кеша компиляции SQLAlchemy, без базы.
+2. User.get(id=...) на SQLite: как было (новый select на каждый вызов) и через кеш подготовленных запросов.
+3. Загрузка N пользователей: N вызовов get против одного get_many, exists против get.
+
+Запуск: python -m benchmarks.bench_manager --calls 5000 --users 1000
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+
+async def timed(calls: int, make_call) -> float:
+    """Среднее время вызова в микросекундах."""
+    start = time.perf_counter()
+    for i in range(calls):
+        await make_call(i)
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--calls', type=int, default=5000)
+    parser.add_argument('--users', type=int, default=1000)
+    args = parser.parse_args()
+
+    from sqlalchemy import insert, select
+    from database.base import Base, init_db
+    from database.connector import db_conn
+    from app.models import User
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'manager.sqlite3')
+    await init_db(dsn=f'sqlite+aiosqlite:///{db_path}', echo=False)
+    async with db_conn.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(User), [{'username': f'user{i}', 'email': f'user{i}@example.com',
+                                                 'password': 'x'} for i in range(args.users)])
+
+    async def uncached_get(**kwargs):
+        """Manager.get до кеша запросов."""
+        async with db_conn.session() as session:
+            query = select(User)
+            for key, value in kwargs.items():
+                if not hasattr(User, key):
+                    raise AttributeError(key)
+                query = query.where(getattr(User, key) == value)
+            result = await session.execute(query)
+            return result.scalar_one_or_none()
+
+    def build_uncached(i):
+        query = select(User).where(User.id == i % args.users + 1)
+        query._generate_cache_key()
+
+    def build_cached(i):
+        query, _ = User._statement('get', {'id': i % args.users + 1})
+        query._generate_cache_key()
+
+    for name, build in (('build select', build_uncached), ('prepared select', build_cached)):
+        start = time.perf_counter()
+        for i in range(args.calls):
+            build(i)
+        print(f'{name:>24}: {(time.perf_counter() - start) / args.calls * 1e6:8.1f} us/call (python only)')
+
+    for name, make_call in (
+        ('get, select per call', lambda i: uncached_get(id=i % args.users + 1)),
+        ('get, prepared', lambda i: User.get(id=i % args.users + 1)),
+        ('exists', lambda i: User.exists(id=i % args.users + 1)),
+    ):
+        await timed(100, make_call)  # прогрев пула и кеша компиляции
+        print(f'{name:>24}: {await timed(args.calls, make_call):8.1f} us/call')
+
+    ids = list(range(1, args.users + 1))
+    start = time.perf_counter()
+    for user_id in ids:
+        await User.get(id=user_id)
+    n_plus_one = time.perf_counter() - start
+    start = time.perf_counter()
+    users = await User.get_many(ids)
+    batched = time.perf_counter() - start
+    assert len(users) == args.users
+    print(f'{args.users} users: {args.users} x get {n_plus_one * 1000:.1f} ms, get_many {batched * 1000:.1f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
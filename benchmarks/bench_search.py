@@ -0,0 +1,76 @@
+"""Полнотекстовый поиск событий на большой SQLite базе.
+
+Заполняет временную базу N событиями из случайных слов (FTS5 индекс обновляется триггерами),
+затем замеряет Event.search для редких, частых и префиксных запросов.
+
+Запуск: python -m benchmarks.bench_search --events 1000000
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+WORDS = 5000
+
+
+def word(i: int) -> str:
+    return f'w{i:04d}'
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=1_000_000)
+    parser.add_argument('--queries', type=int, default=200, help='Queries per query kind')
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    from sqlalchemy import insert
+    from database.base import Base, init_db
+    from database.connector import db_conn
+    from app.models import Event
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'search.sqlite3')
+    await init_db(dsn=f'sqlite+aiosqlite:///{db_path}', echo=False)
+    async with db_conn.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+
+    # Частота слов убывает по закону Ципфа, как в обычном тексте.
+    weights = [1 / (i + 1) for i in range(WORDS)]
+    now = datetime.now(timezone.utc)
+    start = time.perf_counter()
+    batch = 10_000
+    for offset in range(0, args.events, batch):
+        rows = [{'title': ' '.join(word(i) for i in rng.choices(range(WORDS), weights, k=4)),
+                 'description': ' '.join(word(i) for i in rng.choices(range(WORDS), weights, k=20)),
+                 'meeting_time': now + timedelta(minutes=rng.randint(-60 * 24 * 30, 60 * 24 * 365))}
+                for _ in range(min(batch, args.events - offset))]
+        async with db_conn.engine.begin() as connection:
+            await connection.execute(insert(Event), rows)
+    print(f'seeded {args.events} events in {time.perf_counter() - start:.1f} s')
+
+    kinds = {
+        'rare word': lambda: word(rng.randrange(WORDS // 2, WORDS)),
+        'two rare words': lambda: f'{word(rng.randrange(1000, WORDS))} {word(rng.randrange(1000, WORDS))}',
+        'frequent word': lambda: word(rng.randrange(0, 10)),
+        'prefix': lambda: word(rng.randrange(100, WORDS))[:4],
+    }
+    for name, make_query in kinds.items():
+        latencies = []
+        for _ in range(args.queries):
+            query = make_query()
+            begin = time.perf_counter()
+            await Event.search(query, limit=args.limit, preview=0)
+            latencies.append(time.perf_counter() - begin)
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p95 = latencies[int(len(latencies) * 0.95)] * 1000
+        print(f'{name:>15}: p50 {p50:8.3f} ms  p95 {p95:8.3f} ms')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+"""Сериализация ленты событий: стандартный путь FastAPI против TypeAdapter схемы ответа.
+
+Стандартный путь - то, что делает FastAPI с результатом обработчика при response_model:
+проверка по полю ответа, jsonable_encoder и json.dumps в JSONResponse (или orjson в ORJSONResponse).
+Путь приложения - app.services.responses.json_response: одна проверка и dump_json в pydantic-core.
+
+Запуск: python -m benchmarks.bench_serialization --events 10000 --users 10
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app import schemas
+from app.handlers.events import EventList
+from app.services.responses import ORJSONResponse, json_response
+
+
+def make_feed(events: int, users: int) -> list[dict]:
+    now = datetime.now()
+    return [{'id': i, 'title': f'Event {i}', 'description': f'Description of event {i}',
+             'meeting_time': now + timedelta(minutes=i), 'subscriber_count': users,
+             'users': [{'username': f'user{j}'} for j in range(users)]} for i in range(events)]
+
+
+def measure(func, repeat: int) -> float:
+    """Лучшее время из `repeat` запусков, в миллисекундах."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=10_000)
+    parser.add_argument('--users', type=int, default=10, help='Subscriber names per event')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    feed = make_feed(args.events, args.users)
+    field = create_response_field(name='Response_get_list_events', type_=list[schemas.Event])
+
+    results = {}
+    for name, response_class in (('fastapi+json', JSONResponse), ('fastapi+orjson', ORJSONResponse)):
+        if response_class is None:
+            continue
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            content = await serialize_response(field=field, response_content=feed, is_coroutine=True)
+            response_class(content)
+            samples.append(time.perf_counter() - start)
+        results[name] = min(samples) * 1000
+    results['type_adapter'] = measure(lambda: json_response(EventList, feed), args.repeat)
+
+    size = len(json_response(EventList, feed).body)
+    print(f'{args.events} events x {args.users} users, {size / 1024:.0f} KiB, best of {args.repeat}')
+    baseline = results['fastapi+json']
+    for name, ms in results.items():
+        print(f'{name:>16}: {ms:8.1f} ms  x{baseline / ms:.1f}')
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,126 @@
+"""Холодный старт: время до первого ответа и задержка первых запросов после (пере)запуска воркеров.
+
+Заполняет SQLite базу, затем несколько раз запускает `uvicorn main:app --workers W` с прогревом
+(APP_WARMUP=1) и без него. Для каждого запуска замеряются:
+- ready_ms: от запуска процесса до первого ответа /api/events;
+- first_ms: задержка этого первого запроса (с несколькими воркерами сокет открыт раньше, чем воркеры готовы);
+- burst_p50_ms/burst_max_ms: следующие `--requests` одновременных запросов, они попадают во все воркеры;
+- stop_ms: от SIGTERM до завершения процесса при открытом потоке /api/events/stream. Если поток не
+  закрывается по сигналу, stop_ms близко к --graceful-timeout.
+
+Запуск: python -m benchmarks.bench_startup --workers 1,4 --events 20000
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def seed(db_path: str, users: int, events: int):
+    from sqlalchemy import insert
+    from database.base import Base, init_db
+    from database.connector import db_conn
+    from app.models import User, Event
+
+    await init_db(dsn=f'sqlite+aiosqlite:///{db_path}', echo=False)
+    now = datetime.now(timezone.utc)
+    async with db_conn.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(User), [{'username': f'user{i}', 'email': f'user{i}@example.com',
+                                                 'password': 'x'} for i in range(users)])
+        await connection.execute(insert(Event), [{'title': f'Event {i}', 'description': f'Description {i}',
+                                                  'meeting_time': now + timedelta(minutes=i + 1)}
+                                                 for i in range(events)])
+    await db_conn.dispose()
+
+
+async def measure(db_path: str, workers: int, warmup: bool, requests: int, graceful_timeout: int) -> dict:
+    import httpx
+
+    port = free_port()
+    env = dict(os.environ, DATABASE_URL=f'sqlite+aiosqlite:///{db_path}', APP_WARMUP=str(int(warmup)),
+               RATE_LIMIT_ENABLED='0')
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'main:app', '--port', str(port),
+                                '--workers', str(workers), '--timeout-graceful-shutdown', str(graceful_timeout),
+                                '--log-level', 'warning'],
+                               env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', timeout=60,
+                                     limits=httpx.Limits(max_connections=None)) as client:
+            while True:
+                request_start = time.perf_counter()
+                try:
+                    response = await client.get('/api/events')
+                    break
+                except httpx.ConnectError:
+                    if process.poll() is not None:
+                        raise RuntimeError('uvicorn exited before serving a request')
+                    await asyncio.sleep(0.01)
+            ready = time.perf_counter()
+            assert response.status_code == 200, response.status_code
+
+            async def timed_request() -> float:
+                # Одновременные запросы идут по разным соединениям и распределяются по воркерам.
+                begin = time.perf_counter()
+                await client.get('/api/events')
+                return time.perf_counter() - begin
+
+            burst = sorted(await asyncio.gather(*(timed_request() for _ in range(requests))))
+
+            async with client.stream('GET', '/api/events/stream') as stream:
+                # Ссылка на итератор обязательна: собранный сборщиком мусора итератор закрыл бы соединение.
+                chunks = stream.aiter_raw()
+                await anext(chunks)  # retry: поток открыт
+                stop_start = time.perf_counter()
+                process.send_signal(signal.SIGTERM)
+                await asyncio.to_thread(process.wait, 60)
+                stop = time.perf_counter() - stop_start
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+    return {
+        'ready_ms': (ready - start) * 1000,
+        'first_ms': (ready - request_start) * 1000,
+        'burst_p50_ms': statistics.median(burst) * 1000,
+        'burst_max_ms': burst[-1] * 1000,
+        'stop_ms': stop * 1000,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--workers', default='1,4', help='Comma separated worker counts')
+    parser.add_argument('--requests', type=int, default=50, help='Concurrent requests after the first response')
+    parser.add_argument('--runs', type=int, default=3, help='Starts per configuration, the median is reported')
+    parser.add_argument('--graceful-timeout', type=int, default=10, help='uvicorn --timeout-graceful-shutdown')
+    args = parser.parse_args()
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'startup.sqlite3')
+    await seed(db_path, args.users, args.events)
+    for workers in (int(count) for count in args.workers.split(',')):
+        for warmup in (False, True):
+            runs = [await measure(db_path, workers, warmup, args.requests, args.graceful_timeout)
+                    for _ in range(args.runs)]
+            medians = {key: round(statistics.median(run[key] for run in runs), 1) for key in runs[0]}
+            print(f'workers {workers} warmup {int(warmup)}: ' + '  '.join(f'{k} {v}' for k, v in medians.items()))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,194 @@
+"""Нагрузочный тест приложения на заполненной SQLite базе.
+
+Создает базу с N пользователями, M событиями и K подписками, затем гоняет запросы к
+/api/token, /api/events, /api/events/my и подписке/отписке /api/event/{id} с заданной конкурентностью.
+Приложение запускается в том же процессе (httpx ASGITransport) или через uvicorn.
+Результат - JSON с пропускной способностью и p50/p95/p99 для каждого сценария.
+
+Запуск: python -m benchmarks.load --users 1000 --events 5000 --subscriptions 20000 --concurrency 1,10,50
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+PASSWORD = 'benchmark-password'
+SCENARIOS = ('token', 'events', 'events_my', 'subscribe')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--subscriptions', type=int, default=20000)
+    parser.add_argument('--concurrency', default='1,10,50', help='Comma separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per scenario and concurrency level')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--mode', choices=('asgi', 'uvicorn'), default='asgi')
+    parser.add_argument('--db', help='SQLite file, a temporary one by default')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+    return parser.parse_args()
+
+
+async def seed(users: int, events: int, subscriptions: int, rng: random.Random):
+    """Заполняет пустую базу. Все пользователи получают один пароль, чтобы bcrypt считался один раз."""
+    from sqlalchemy import insert, update, select, func
+    from database.base import Base
+    from database.connector import db_conn
+    from app.models import User, Event, subscribers_table
+    from app.services.encryption import password_hasher
+
+    password = await password_hasher.hash(PASSWORD)
+    now = datetime.now(timezone.utc)
+    async with db_conn.engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.execute(insert(User), [
+            {'username': f'user{i}', 'email': f'user{i}@example.com', 'password': password} for i in range(users)
+        ])
+        await connection.execute(insert(Event), [
+            {'title': f'Event {i}', 'description': f'Description of event {i}',
+             'meeting_time': now + timedelta(days=1, minutes=i)} for i in range(events)
+        ])
+        pairs = set()
+        while len(pairs) < min(subscriptions, users * events):
+            pairs.add((rng.randint(1, users), rng.randint(1, events)))
+        if pairs:
+            await connection.execute(insert(subscribers_table),
+                                     [{'user_id': user_id, 'post_id': post_id} for user_id, post_id in pairs])
+        counts = (select(func.count()).select_from(subscribers_table)
+                  .where(subscribers_table.c.post_id == Event.id).scalar_subquery())
+        await connection.execute(update(Event).values(subscriber_count=counts))
+
+
+def percentile(sorted_values: list[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(percent / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def run_scenario(client, name: str, concurrency: int, total: int, users: int, events: int,
+                       tokens: list[str], rng: random.Random) -> dict:
+    latencies: list[float] = []
+    statuses: dict[int, int] = {}
+
+    async def request(method: str, url: str, **kwargs):
+        start = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    async def one(i: int):
+        user = rng.randrange(users)
+        headers = {'Authorization': f'Bearer {tokens[user]}'}
+        if name == 'token':
+            await request('POST', '/api/token', json={'username': f'user{user}', 'password': PASSWORD})
+        elif name == 'events':
+            await request('GET', '/api/events')
+        elif name == 'events_my':
+            await request('GET', '/api/events/my', headers=headers)
+        elif name == 'subscribe':
+            # Каждая итерация - подписка и отписка, чтобы база оставалась в исходном состоянии.
+            event_id = rng.randint(1, events)
+            await request('POST', f'/api/event/{event_id}', json={'action': 'add'}, headers=headers,
+                          params={'return_event': 'false'})
+            await request('POST', f'/api/event/{event_id}', json={'action': 'remove'}, headers=headers,
+                          params={'return_event': 'false'})
+
+    queue = iter(range(total))
+
+    async def worker():
+        for i in queue:
+            await one(i)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        'scenario': name,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 2),
+        'statuses': statuses,
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def main():
+    args = parse_args()
+    rng = random.Random(args.seed)
+    db_path = args.db or os.path.join(tempfile.mkdtemp(), 'benchmark.sqlite3')
+    # Настройки читаются приложением при старте, поэтому задаются до импорта.
+    os.environ['DATABASE_URL'] = f'sqlite+aiosqlite:///{db_path}'
+    os.environ.setdefault('EVENTS_FEED_TTL', '5')
+    # Все запросы идут с одного адреса, ограничение частоты исказило бы замеры.
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+    # База заполняется после старта приложения напрямую, мимо кешей - прогретые на пустой базе кеши устарели бы.
+    os.environ.setdefault('APP_WARMUP', '0')
+
+    import httpx
+    import main as application
+    from app.services import auth
+
+    app = application.app
+    async with app.router.lifespan_context(app):
+        await seed(args.users, args.events, args.subscriptions, rng)
+        tokens = [auth.create_jwt_token_pair(str(user_id))[0] for user_id in range(1, args.users + 1)]
+
+        server = server_task = None
+        if args.mode == 'uvicorn':
+            import uvicorn
+            port = free_port()
+            server = uvicorn.Server(uvicorn.Config(app, host='127.0.0.1', port=port, log_level='warning',
+                                                   lifespan='off'))
+            server_task = asyncio.create_task(server.serve())
+            while not server.started:
+                await asyncio.sleep(0.05)
+            client = httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}',
+                                       limits=httpx.Limits(max_connections=None))
+        else:
+            client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://benchmark')
+
+        results = []
+        async with client:
+            for name in args.scenarios.split(','):
+                for concurrency in (int(level) for level in args.concurrency.split(',')):
+                    results.append(await run_scenario(client, name, concurrency, args.requests, args.users,
+                                                      args.events, tokens, rng))
+
+        if server is not None:
+            server.should_exit = True
+            await server_task
+
+    report = {
+        'config': {key: value for key, value in vars(args).items() if key != 'output'},
+        'database': db_path,
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as file:
+            file.write(output)
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -1,23 +1,43 @@
 from typing_extensions import Self
-from typing import Sequence
+from typing import Any, AsyncIterator, Collection, Sequence
 
-from sqlalchemy import select
+from sqlalchemy import select, make_url, Table, RowMapping, bindparam, func, literal
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import declarative_base
 
+from .config import DatabaseSettings
 from .connector import db_conn
 
 Base = declarative_base()
 
+# Сколько значений подставляется в один IN (...). Больше - несколько запросов: у SQLite есть предел
+# количества параметров, а длинные списки медленно компилируются.
+IN_CHUNK_SIZE = 500
 
-async def init_db(dsn='sqlite+aiosqlite:///db.sqlite3', echo=True):
+
+async def init_db(settings: DatabaseSettings | None = None, **overrides):
     """
     Инициализирует базу данных.
     :param:
-    - dsn (str): Строка подключения к базе данных. По умолчанию: 'sqlite+aiosqlite:///db.sqlite3'.
-    - echo (bool): Флаг для включения или отключения вывода SQL-запросов в консоль. По умолчанию: True.
+    - settings (DatabaseSettings): Настройки подключения. По умолчанию читаются из переменных окружения.
+    - overrides: Отдельные настройки поверх `settings`, например dsn='sqlite+aiosqlite:///test.sqlite3', echo=True.
     """
-    print(f"Initializing database : {dsn}")
-    db_conn.initialize(dsn=dsn, echo=echo)
+    settings = settings or DatabaseSettings.from_env()
+    if overrides:
+        settings = settings.model_copy(update=overrides)
+    print(f"Initializing database : {make_url(settings.dsn).render_as_string(hide_password=True)}")
+    db_conn.initialize(**settings.model_dump())
+
+
+def insert_ignore(session: AsyncSession, table: Table):
+    """INSERT ... ON CONFLICT DO NOTHING для диалекта, к которому подключена сессия."""
+    dialect = session.bind.dialect.name
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing()
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    raise NotImplementedError(f'INSERT ... ON CONFLICT is not supported for {dialect}')
 
 
 class Manager:
@@ -25,32 +45,132 @@ class Manager:
     @classmethod
     async def create(cls, **kwargs) -> Self:
         obj = cls(**kwargs)
-        async with db_conn.session as session:
+        async with db_conn.session() as session:
             session.add(obj)  # Добавляем объект в его таблицу.
-            await session.commit()  # Подтверждаем.
-            await session.refresh(obj)  # Обновляем атрибуты у объекта, чтобы получить его primary key.
+            await session.commit()  # Подтверждаем. Primary key заполняется при flush, refresh не нужен.
         return obj
 
+    async def update(self, **kwargs) -> Self:
+        async with db_conn.session() as session:
+            obj = await session.merge(self)
+            for key, value in kwargs.items():
+                if not hasattr(obj, key):
+                    raise AttributeError(f"Class {self.__class__.__name__} has no attribute '{key}'")
+                setattr(obj, key, value)
+            await session.commit()
+            return obj
+
     async def delete(self):
-        async with db_conn.session as session:
+        async with db_conn.session() as session:
             await session.delete(self)
             await session.commit()
             return True
 
+    # Подготовленные запросы по форме фильтра: (модель, вид запроса, ключи с видом условия: '=', 'in', 'null').
+    # Готовый Select с bindparam не строится заново и не пересчитывает ключ кеша компиляции SQLAlchemy.
+    _statements: dict[tuple, Any] = {}
+
     @classmethod
-    async def get(cls, **kwargs) -> Self | None:
-        async with db_conn.session as session:
-            query = select(cls)
-            for key, value in kwargs.items():
-                if not hasattr(cls, key):
+    def _statement(cls, kind: str, filters: dict[str, Any]):
+        """Запрос вида `kind` ('get', 'exists', 'count') с условием на каждый фильтр:
+        `key = :key`, `key IN :key` для списка и `key IS NULL` для None."""
+        shape = (cls, kind, tuple((key, _condition(value)) for key, value in filters.items()))
+        statement = cls._statements.get(shape)
+        if statement is None:
+            conditions = []
+            for key, condition in shape[2]:
+                if key not in cls.__mapper__.columns:
                     raise AttributeError(f"Class {cls.__name__} has no attribute '{key}'")
-                query = query.where(getattr(cls, key) == value)
-            result = await session.execute(query)
-            result = result.scalar_one_or_none()
-            return result
+                attribute = getattr(cls, key)
+                if condition == 'null':
+                    conditions.append(attribute.is_(None))
+                elif condition == 'in':
+                    conditions.append(attribute.in_(bindparam(key, expanding=True)))
+                else:
+                    conditions.append(attribute == bindparam(key))
+            if kind == 'get':
+                statement = select(cls)
+            elif kind == 'exists':
+                statement = select(literal(1)).select_from(cls).limit(1)
+            else:
+                statement = select(func.count()).select_from(cls)
+            statement = cls._statements[shape] = statement.where(*conditions)
+        return statement, {key: value for key, value in filters.items() if value is not None}
+
+    @classmethod
+    async def get(cls, **kwargs) -> Self | None:
+        async with db_conn.session() as session:
+            result = await session.execute(*cls._statement('get', kwargs))
+            return result.scalar_one_or_none()
+
+    @classmethod
+    async def filter(cls, chunk_size: int = IN_CHUNK_SIZE, **kwargs) -> list[Self]:
+        """Объекты, у которых все поля равны переданным значениям. Значение-список означает IN (...).
+
+        Самый длинный список разбивается на части по `chunk_size` - по запросу на часть, в одной сессии.
+        """
+        chunk_key = max((key for key, value in kwargs.items() if _is_collection(value)),
+                        key=lambda key: len(kwargs[key]), default=None)
+        if chunk_key is None:
+            chunks = [kwargs]
+        else:
+            values = list(dict.fromkeys(kwargs[chunk_key]))
+            chunks = [{**kwargs, chunk_key: values[start:start + chunk_size]}
+                      for start in range(0, len(values), chunk_size)]
+        objects = []
+        async with db_conn.session() as session:
+            for params in chunks:
+                result = await session.execute(*cls._statement('get', params))
+                objects.extend(result.scalars())
+        return objects
+
+    @classmethod
+    async def get_many(cls, ids: Collection, key: str = 'id', chunk_size: int = IN_CHUNK_SIZE) -> dict[Any, Self]:
+        """Объекты по значениям поля `key` одним запросом на `chunk_size` значений вместо запроса на каждое.
+
+        :return: Словарь значение -> объект. Значений, для которых нет строки, в нем нет.
+        """
+        objects = await cls.filter(chunk_size=chunk_size, **{key: list(ids)}) if ids else []
+        return {getattr(obj, key): obj for obj in objects}
+
+    @classmethod
+    async def exists(cls, **kwargs) -> bool:
+        """Есть ли строка с такими значениями полей. Объект не загружается."""
+        async with db_conn.session() as session:
+            return await session.scalar(*cls._statement('exists', kwargs)) is not None
+
+    @classmethod
+    async def count(cls, **kwargs) -> int:
+        """Количество строк с такими значениями полей (без фильтров - всех строк)."""
+        async with db_conn.session() as session:
+            return await session.scalar(*cls._statement('count', kwargs))
 
     @classmethod
     async def all(cls) -> Sequence[Self]:
-        async with db_conn.session as session:
+        async with db_conn.session() as session:
             result = await session.execute(select(cls))
             return result.scalars().all()
+
+    @classmethod
+    async def stream(cls, *columns, chunk_size: int = 1000) -> AsyncIterator[Sequence[RowMapping]]:
+        """Читает таблицу серверным курсором в порядке первичного ключа, порциями по `chunk_size` строк.
+
+        В памяти одновременно находится не больше одной порции, независимо от размера таблицы.
+        :param columns: Загружаемые колонки.
+        """
+        query = select(*columns).order_by(*cls.__table__.primary_key.columns).execution_options(yield_per=chunk_size)
+        async with db_conn.session() as session:
+            result = await session.stream(query)
+            async for partition in result.mappings().partitions():
+                yield partition
+
+
+def _is_collection(value) -> bool:
+    return isinstance(value, (list, tuple, set, frozenset))
+
+
+def _condition(value) -> str:
+    if value is None:
+        return 'null'
+    return 'in' if _is_collection(value) else '='
+
@@ -1,24 +1,168 @@
-from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, create_async_engine
+import time
+from contextlib import AsyncExitStack
+from typing import AsyncIterator
+
+from sqlalchemy import event, make_url
+from sqlalchemy.ext.asyncio import AsyncSession, AsyncEngine, create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул соединений, который считает время ожидания свободного соединения."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            self.checkouts += 1
+            self.wait_time_total += waited
+            if waited > self.wait_time_max:
+                self.wait_time_max = waited
+
+    def recreate(self):
+        # pre_ping/invalidate могут пересоздать пул, счетчики при этом сохраняем.
+        new_pool = super().recreate()
+        new_pool.checkouts = self.checkouts
+        new_pool.wait_time_total = self.wait_time_total
+        new_pool.wait_time_max = self.wait_time_max
+        return new_pool
+
+
+def create_engine(dsn: str, echo: bool, pool_size: int, max_overflow: int, pool_timeout: float, pool_recycle: int,
+                  pool_pre_ping: bool, sqlite_wal: bool, sqlite_mmap_size: int, sqlite_busy_timeout: int,
+                  statement_cache_size: int) -> AsyncEngine:
+    """Создает движок с настройками, подходящими для конкретного драйвера."""
+    url = make_url(dsn)
+    options = dict(echo=echo, pool_pre_ping=pool_pre_ping)
+    in_memory = url.database in (None, '', ':memory:') or url.query.get('mode') == 'memory'
+    if url.get_backend_name() != 'sqlite' or not in_memory:
+        # Для in-memory SQLite используется StaticPool, у которого нет настроек размера.
+        options.update(poolclass=TimedQueuePool, pool_size=pool_size, max_overflow=max_overflow,
+                       pool_timeout=pool_timeout, pool_recycle=pool_recycle)
+    if url.get_driver_name() == 'asyncpg':
+        # Кеш подготовленных выражений asyncpg и соответствующий кеш диалекта SQLAlchemy.
+        options['connect_args'] = dict(statement_cache_size=statement_cache_size,
+                                       prepared_statement_cache_size=statement_cache_size)
+
+    engine = create_async_engine(url, **options)
+
+    if url.get_backend_name() == 'sqlite':
+        pragmas = [f'PRAGMA busy_timeout = {int(sqlite_busy_timeout)}', f'PRAGMA mmap_size = {int(sqlite_mmap_size)}']
+        if sqlite_wal:
+            pragmas += ['PRAGMA journal_mode = WAL', 'PRAGMA synchronous = NORMAL']
+
+        @event.listens_for(engine.sync_engine, 'connect')
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    return engine
 
 
 class AsyncConnection:
 
     def __init__(self):
         self._engine = None
-        self._session = None
+        self._sessionmaker = None
+        self._replica_engine = None
+        self._replica_sessionmaker = None
 
-    def initialize(self, dsn: str, echo: bool = True):
-        """Например: 'sqlite+aiosqlite:///db.sqlite3'"""
-        self._engine = create_async_engine(dsn, echo=echo)
-        self._session = AsyncSession(self._engine)
+    def initialize(self, dsn: str, echo: bool = True, pool_size: int = 5, max_overflow: int = 10,
+                   pool_timeout: float = 30, pool_recycle: int = 1800, pool_pre_ping: bool = True,
+                   replica_dsn: str | None = None, sqlite_wal: bool = True, sqlite_mmap_size: int = 0,
+                   sqlite_busy_timeout: int = 5000, statement_cache_size: int = 100):
+        """Например: 'sqlite+aiosqlite:///db.sqlite3'
+
+        :param pool_size: Количество постоянно открытых соединений в пуле.
+        :param max_overflow: Сколько соединений можно открыть сверх pool_size при пиковой нагрузке.
+        :param pool_timeout: Сколько секунд ждать свободное соединение, прежде чем выбросить ошибку.
+        :param pool_recycle: Через сколько секунд пересоздавать соединение (-1 - никогда).
+        :param pool_pre_ping: Проверять соединение перед выдачей из пула.
+        :param replica_dsn: Реплика для запросов только на чтение (`read_session`).
+        :param sqlite_wal: SQLite: журнал WAL и synchronous=NORMAL.
+        :param sqlite_mmap_size: SQLite: размер memory-mapped I/O в байтах (0 - отключить).
+        :param sqlite_busy_timeout: SQLite: сколько мс ждать снятия блокировки записи.
+        :param statement_cache_size: asyncpg: размер кеша подготовленных выражений на соединение.
+        """
+        options = dict(echo=echo, pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout,
+                       pool_recycle=pool_recycle, pool_pre_ping=pool_pre_ping, sqlite_wal=sqlite_wal,
+                       sqlite_mmap_size=sqlite_mmap_size, sqlite_busy_timeout=sqlite_busy_timeout,
+                       statement_cache_size=statement_cache_size)
+        self._engine = create_engine(dsn, **options)
+        # expire_on_commit=False - объекты остаются доступными после закрытия сессии.
+        self._sessionmaker = async_sessionmaker(self._engine, expire_on_commit=False)
+        if replica_dsn:
+            self._replica_engine = create_engine(replica_dsn, **options)
+            self._replica_sessionmaker = async_sessionmaker(self._replica_engine, expire_on_commit=False)
+        else:
+            self._replica_engine = None
+            self._replica_sessionmaker = None
 
-    @property
     def session(self) -> AsyncSession:
-        return self._session
+        """Возвращает новую независимую сессию. Использовать как `async with db_conn.session() as session`."""
+        return self._sessionmaker()
+
+    def read_session(self) -> AsyncSession:
+        """Сессия для запросов только на чтение: на реплике, если она настроена, иначе на основной базе.
+
+        Реплика может отставать, поэтому читать только что записанные данные нужно через `session()`.
+        """
+        if self._replica_sessionmaker is not None:
+            return self._replica_sessionmaker()
+        return self._sessionmaker()
+
+    async def get_session(self) -> AsyncIterator[AsyncSession]:
+        """FastAPI зависимость: одна сессия на запрос, закрывается после ответа."""
+        async with self.session() as session:
+            yield session
+
+    async def warm_up(self, connections: int):
+        """Открывает до `connections` соединений каждого пула заранее (не больше pool_size, лишние пул закрыл бы),
+        чтобы первые запросы после старта не ждали подключения к базе."""
+        for engine in (self._engine, self._replica_engine):
+            if engine is None:
+                continue
+            size = engine.pool.size() if isinstance(engine.pool, AsyncAdaptedQueuePool) else 1
+            async with AsyncExitStack() as stack:
+                for _ in range(min(connections, size)):
+                    connection = await stack.enter_async_context(engine.connect())
+                    await connection.exec_driver_sql('SELECT 1')
+
+    async def dispose(self):
+        """Закрывает все соединения пулов. Вызывается при остановке приложения."""
+        for engine in (self._engine, self._replica_engine):
+            if engine is not None:
+                await engine.dispose()
+
+    def pool_status(self) -> dict:
+        """Метрики пула соединений."""
+        pool = self._engine.pool
+        status = {'pool': pool.__class__.__name__}
+        if isinstance(pool, AsyncAdaptedQueuePool):
+            status.update(size=pool.size(), checked_in=pool.checkedin(), checked_out=pool.checkedout(),
+                          overflow=max(pool.overflow(), 0))
+        if isinstance(pool, TimedQueuePool):
+            status.update(checkouts=pool.checkouts, wait_time_total=pool.wait_time_total,
+                          wait_time_max=pool.wait_time_max)
+        return status
 
     @property
     def engine(self) -> AsyncEngine:
         return self._engine
 
+    @property
+    def replica_engine(self) -> AsyncEngine | None:
+        return self._replica_engine
+
 
 db_conn = AsyncConnection()
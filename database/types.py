@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import DateTime
+from sqlalchemy.types import TypeDecorator
+
+
+def as_utc(value: datetime) -> datetime:
+    """Приводит время к UTC. Время без часового пояса считается уже указанным в UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class UTCDateTime(TypeDecorator):
+    """Время с часовым поясом, которое всегда хранится и возвращается в UTC.
+
+    В PostgreSQL это timestamptz. SQLite не хранит часовой пояс, поэтому значения записываются
+    как UTC без смещения - так строки сравниваются и сортируются в хронологическом порядке,
+    а при чтении им возвращается tzinfo=UTC.
+    """
+    impl = DateTime(timezone=True)
+    cache_ok = True
+
+    def process_bind_param(self, value: datetime | None, dialect) -> datetime | None:
+        if value is None:
+            return None
+        value = as_utc(value)
+        if dialect.name == 'sqlite':
+            return value.replace(tzinfo=None)
+        return value
+
+    def process_result_value(self, value: datetime | None, dialect) -> datetime | None:
+        if value is None:
+            return None
+        return as_utc(value)
@@ -1,10 +1,47 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
+from sqlalchemy.orm import configure_mappers
+from uvicorn.server import Server
 
+from app.config import AppSettings
 from app.handlers.auth import router as router_auth
-from app.handlers.events import router as router_events
+from app.handlers.events import router as router_events, build_events_feed
+from app.handlers.metrics import router as router_metrics
 from database.base import init_db
+from database.connector import db_conn
+from app.services.auth import verified_tokens
+from app.services.cache import user_cache
+from app.services.encryption import password_hasher
+from app.services.feed import events_feed
+from app.services.revocation import revoked_tokens
+from app.services.push import push_hub
+from app.services.upcoming import upcoming_events
+from app.models import User, Event, subscription_writes
+from app.services.ratelimit import register_ip_limiter, login_ip_limiter, login_username_limiter
+from app.services.metrics import MetricsMiddleware, registry, instrument_engine
+from app.services.responses import DefaultJSONResponse
+
+logger = logging.getLogger(__name__)
+
+# Длительность последнего старта процесса, секунды: весь старт и отдельно прогрев.
+startup_stats: dict[str, float] = {}
 
-app = FastAPI()
+registry.add_collector('db_pool', db_conn.pool_status)
+registry.add_collector('password_hasher', password_hasher.stats)
+registry.add_collector('user_cache', user_cache.stats)
+registry.add_collector('token_cache', verified_tokens.stats)
+registry.add_collector('events_feed', events_feed.stats)
+registry.add_collector('revoked_tokens', revoked_tokens.stats)
+registry.add_collector('push', push_hub.stats)
+registry.add_collector('upcoming_index', upcoming_events.stats)
+registry.add_collector('subscription_writes', subscription_writes.stats)
+registry.add_collector('startup', lambda: startup_stats)
+for limiter in (register_ip_limiter, login_ip_limiter, login_username_limiter):
+    registry.add_collector(f'rate_limit_{limiter.name}', limiter.stats)
 
 
 # для работы alembic нужно сначала его установить, poetry add alembic
@@ -18,10 +55,91 @@ app = FastAPI()
 # после чего прописываем команду для создание таблиц в бд alembic upgrade head
 
 
-@app.on_event('startup')
-async def startup():
-    await init_db(echo=True)
+def close_streams_on_exit():
+    """Завершает потоки push_hub по сигналу остановки uvicorn.
+
+    Получив SIGTERM/SIGINT, uvicorn перестает принимать соединения и ждет, пока закроются открытые, и только
+    потом останавливает приложение (lifespan). Поток SSE сам не заканчивается, поэтому без этого остановка
+    ждала бы отключения всех клиентов или истечения --timeout-graceful-shutdown.
+    """
+    handle_exit = Server.handle_exit
+
+    def handle_exit_closing_streams(server: Server, sig, frame):
+        push_hub.close_streams()
+        handle_exit(server, sig, frame)
+
+    Server.handle_exit = handle_exit_closing_streams
+
+
+close_streams_on_exit()
+
+
+async def warm_up(settings: AppSettings):
+    """Выполняет заранее то, что иначе сделали бы первые запросы воркера."""
+    configure_mappers()
+    await db_conn.warm_up(settings.warmup_connections or settings.database.pool_size)
+    await password_hasher.warm_up()
+    # Частые запросы компилируются в кеш SQLAlchemy, заодно заполняется лента.
+    await events_feed.get(build_events_feed)
+    await User.get(id=0)
+    await User.get(username='')
+    await Event.exists(id=0)
+
+
+def create_app(settings: AppSettings | None = None) -> FastAPI:
+    """Создает приложение. Без `settings` настройки читаются из переменных окружения.
+
+    Запуск: `uvicorn main:app --timeout-graceful-shutdown 30` или `uvicorn main:create_app --factory ...`.
+    Без --timeout-graceful-shutdown uvicorn при остановке ждет завершения запросов неограниченно.
+    """
+    settings = settings or AppSettings.from_env()
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        start = time.perf_counter()
+        await init_db(settings.database)
+        instrument_engine(db_conn.engine)
+        if db_conn.replica_engine is not None:
+            instrument_engine(db_conn.replica_engine)
+        await push_hub.start()
+        if subscription_writes.enabled:
+            subscription_writes.start()
+        upcoming_index = settings.upcoming_index
+        if upcoming_index is None:
+            # Без общего брокера индекс не узнает об изменениях других воркеров, лента читается из базы.
+            upcoming_index = push_hub.broker.shared
+        if upcoming_index:
+            push_hub.add_listener(upcoming_events.on_message)
+            await upcoming_events.start(Event._load_upcoming, Event._last_event_id)
+        if settings.warmup:
+            warmup_start = time.perf_counter()
+            try:
+                await warm_up(settings)
+            except Exception:
+                # Приложение работает и без прогрева, кеши заполнят первые запросы.
+                logger.exception('Warm-up failed')
+            startup_stats['warmup_seconds'] = time.perf_counter() - warmup_start
+        startup_stats['seconds'] = time.perf_counter() - start
+
+        yield
+
+        try:
+            await asyncio.wait_for(subscription_writes.drain(), settings.shutdown_timeout)
+        except asyncio.TimeoutError:
+            logger.warning('Subscription write queue was not drained in %s s', settings.shutdown_timeout)
+        if upcoming_index:
+            await upcoming_events.stop()
+            push_hub.remove_listener(upcoming_events.on_message)
+        await push_hub.stop()
+        password_hasher.shutdown()
+        await db_conn.dispose()
+
+    app = FastAPI(default_response_class=DefaultJSONResponse, lifespan=lifespan)
+    app.add_middleware(MetricsMiddleware)
+    app.include_router(router=router_auth)
+    app.include_router(router=router_events)
+    app.include_router(router=router_metrics)
+    return app
 
 
-app.include_router(router=router_auth)
-app.include_router(router=router_events)
+app = create_app()
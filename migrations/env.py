@@ -1,6 +1,7 @@
+import os
 from logging.config import fileConfig
 
-from sqlalchemy import engine_from_config
+from sqlalchemy import engine_from_config, make_url
 from sqlalchemy import pool
 
 from alembic import context
@@ -14,6 +15,13 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# DATABASE_URL (как и приложение) переопределяет sqlalchemy.url из alembic.ini.
+# Миграции выполняются синхронно, поэтому асинхронный драйвер заменяется драйвером по умолчанию.
+if os.environ.get('DATABASE_URL'):
+    database_url = make_url(os.environ['DATABASE_URL'])
+    database_url = database_url.set(drivername=database_url.get_backend_name())
+    config.set_main_option('sqlalchemy.url', database_url.render_as_string(hide_password=False))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
@@ -23,6 +31,15 @@ from app.models import Base, User, Event
 target_metadata = Base.metadata
 
 
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # Таблица полнотекстового поиска SQLite и ее служебные таблицы создаются миграцией вручную.
+    if type_ == 'table' and reflected and compare_to is None and name.startswith('events_fts'):
+        return False
+    return True
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -47,6 +64,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        include_object=include_object,
     )
 
     with context.begin_transaction():
@@ -68,7 +86,7 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata, include_object=include_object
         )
 
         with context.begin_transaction():
@@ -0,0 +1,32 @@
+"""0002_events_subscriber_count
+
+Revision ID: 0949d4e42094
+Revises: 3af2fc5b0bc4
+Create Date: 2026-10-18 10:30:12.418305
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0949d4e42094'
+down_revision: Union[str, None] = '3af2fc5b0bc4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.add_column(sa.Column('subscriber_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute(
+        'UPDATE events SET subscriber_count = '
+        '(SELECT count(*) FROM subscribers WHERE subscribers.post_id = events.id)'
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('events') as batch_op:
+        batch_op.drop_column('subscriber_count')
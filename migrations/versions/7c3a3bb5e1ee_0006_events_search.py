@@ -0,0 +1,54 @@
+"""0006_events_search
+
+Revision ID: 7c3a3bb5e1ee
+Revises: 8ebf98579836
+Create Date: 2026-10-18 10:42:52.038587
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c3a3bb5e1ee'
+down_revision: Union[str, None] = '8ebf98579836'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+SEARCH_VECTOR_SQL = ("(setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+                     "setweight(to_tsvector('simple', coalesce(description, '')), 'B'))")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        # Внешняя таблица FTS5: хранит только индекс, текст читается из events по rowid = id.
+        op.execute("CREATE VIRTUAL TABLE events_fts USING fts5("
+                   "title, description, content='events', content_rowid='id', "
+                   "tokenize='unicode61 remove_diacritics 2', prefix='2 3')")
+        op.execute("CREATE TRIGGER events_fts_insert AFTER INSERT ON events BEGIN "
+                   "INSERT INTO events_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+                   "END")
+        op.execute("CREATE TRIGGER events_fts_delete AFTER DELETE ON events BEGIN "
+                   "INSERT INTO events_fts(events_fts, rowid, title, description) "
+                   "VALUES ('delete', old.id, old.title, old.description); END")
+        op.execute("CREATE TRIGGER events_fts_update AFTER UPDATE OF title, description ON events BEGIN "
+                   "INSERT INTO events_fts(events_fts, rowid, title, description) "
+                   "VALUES ('delete', old.id, old.title, old.description); "
+                   "INSERT INTO events_fts(rowid, title, description) VALUES (new.id, new.title, new.description); "
+                   "END")
+        op.execute("INSERT INTO events_fts(events_fts) VALUES ('rebuild')")
+    else:
+        op.execute(f"CREATE INDEX ix_events_search ON events USING gin ({SEARCH_VECTOR_SQL})")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER events_fts_update")
+        op.execute("DROP TRIGGER events_fts_delete")
+        op.execute("DROP TRIGGER events_fts_insert")
+        op.execute("DROP TABLE events_fts")
+    else:
+        op.execute("DROP INDEX ix_events_search")
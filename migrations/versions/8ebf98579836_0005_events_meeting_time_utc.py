@@ -0,0 +1,35 @@
+"""0005_events_meeting_time_utc
+
+Revision ID: 8ebf98579836
+Revises: f42ab1dba91f
+Create Date: 2026-10-18 10:40:44.173382
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8ebf98579836'
+down_revision: Union[str, None] = 'f42ab1dba91f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Хранимое время без пояса считается UTC. SQLite не хранит пояс - там меняется только тип в модели.
+    if op.get_bind().dialect.name == 'sqlite':
+        return
+    op.alter_column('events', 'meeting_time',
+                    existing_type=sa.DateTime(), type_=sa.DateTime(timezone=True),
+                    postgresql_using="meeting_time AT TIME ZONE 'UTC'")
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        return
+    op.alter_column('events', 'meeting_time',
+                    existing_type=sa.DateTime(timezone=True), type_=sa.DateTime(),
+                    postgresql_using="meeting_time AT TIME ZONE 'UTC'")
@@ -0,0 +1,49 @@
+"""0003_subscribers_indexes
+
+Revision ID: c0c8c30d3744
+Revises: 0949d4e42094
+Create Date: 2026-10-18 10:41:57.203114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c0c8c30d3744'
+down_revision: Union[str, None] = '0949d4e42094'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Перед созданием первичного ключа убираем неполные строки и повторные подписки.
+    op.execute('DELETE FROM subscribers WHERE user_id IS NULL OR post_id IS NULL')
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute('DELETE FROM subscribers WHERE rowid NOT IN '
+                   '(SELECT min(rowid) FROM subscribers GROUP BY user_id, post_id)')
+    else:
+        op.execute('DELETE FROM subscribers a USING subscribers b '
+                   'WHERE a.ctid > b.ctid AND a.user_id = b.user_id AND a.post_id = b.post_id')
+    op.execute(
+        'UPDATE events SET subscriber_count = '
+        '(SELECT count(*) FROM subscribers WHERE subscribers.post_id = events.id)'
+    )
+
+    with op.batch_alter_table('subscribers', recreate='always') as batch_op:
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.alter_column('post_id', existing_type=sa.Integer(), nullable=False)
+        batch_op.create_primary_key('pk_subscribers', ['user_id', 'post_id'])
+    op.create_index('ix_subscribers_post_id_user_id', 'subscribers', ['post_id', 'user_id'], unique=False)
+    op.create_index(op.f('ix_events_meeting_time'), 'events', ['meeting_time'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_events_meeting_time'), table_name='events')
+    op.drop_index('ix_subscribers_post_id_user_id', table_name='subscribers')
+    with op.batch_alter_table('subscribers', recreate='always') as batch_op:
+        batch_op.drop_constraint('pk_subscribers', type_='primary')
+        batch_op.alter_column('user_id', existing_type=sa.Integer(), nullable=True)
+        batch_op.alter_column('post_id', existing_type=sa.Integer(), nullable=True)
@@ -0,0 +1,27 @@
+"""0004_users_email_unique
+
+Revision ID: f42ab1dba91f
+Revises: c0c8c30d3744
+Create Date: 2026-10-18 11:02:36.581902
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f42ab1dba91f'
+down_revision: Union[str, None] = 'c0c8c30d3744'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Упадет, если в базе уже есть повторяющиеся email - их нужно разрешить вручную до миграции.
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_users_email'), table_name='users')
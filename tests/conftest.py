@@ -0,0 +1,58 @@
+import os
+import sqlite3
+from contextlib import closing
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event
+
+from database.base import init_db
+from database.connector import db_conn
+
+MIGRATIONS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'migrations')
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+def migrate(path: str):
+    """Создает схему в SQLite файле миграциями, как в рабочей базе."""
+    config = Config()
+    config.set_main_option('script_location', MIGRATIONS)
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv('DATABASE_URL', f'sqlite+aiosqlite:///{path}')
+        command.upgrade(config, 'head')
+
+
+@pytest.fixture(scope='module')
+def migrated_db(tmp_path_factory) -> str:
+    """SQLite база после `alembic upgrade head` с несколькими пользователями, событиями и подписками."""
+    path = str(tmp_path_factory.mktemp('db') / 'test.sqlite3')
+    migrate(path)
+    with closing(sqlite3.connect(path)) as connection:
+        connection.executemany("INSERT INTO users (username, password) VALUES (?, 'x')",
+                               [(f'user{i}',) for i in range(50)])
+        connection.executemany("INSERT INTO events (title, description, meeting_time, subscriber_count) "
+                               "VALUES ('title', 'description', ?, 0)",
+                               [(f'2030-01-{i % 28 + 1:02d} 00:00:00',) for i in range(50)])
+        connection.executemany('INSERT INTO subscribers (user_id, post_id) VALUES (?, ?)',
+                               [(user_id, event_id) for user_id in range(1, 20) for event_id in range(1, 10)])
+        connection.commit()
+    return path
+
+
+@pytest.fixture
+async def statements(migrated_db) -> list[tuple[str, tuple]]:
+    """Подключает db_conn к `migrated_db` и собирает выполненные SQL запросы с параметрами."""
+    await init_db(dsn=f'sqlite+aiosqlite:///{migrated_db}', echo=False)
+    executed = []
+
+    @event.listens_for(db_conn.engine.sync_engine, 'before_cursor_execute')
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        executed.append((statement, parameters))
+
+    yield executed
+    await db_conn.dispose()
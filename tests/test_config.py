@@ -0,0 +1,12 @@
+import pytest
+
+from app.config import AppSettings
+
+
+@pytest.mark.parametrize('value, expected', [(None, None), ('', None), ('1', True), ('true', True), ('0', False)])
+def test_upcoming_index_from_env(monkeypatch, value, expected):
+    monkeypatch.delenv('APP_UPCOMING_INDEX', raising=False)
+    if value is not None:
+        monkeypatch.setenv('APP_UPCOMING_INDEX', value)
+
+    assert AppSettings.from_env().upcoming_index is expected
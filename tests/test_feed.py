@@ -0,0 +1,25 @@
+import pytest
+
+from app.services.feed import etag_matches
+
+ETAG = '"0123abcd"'
+
+
+@pytest.mark.parametrize('if_none_match, expected', [
+    (None, False),
+    ('', False),
+    ('"0123abcd"', True),
+    ('W/"0123abcd"', True),
+    ('*', True),
+    (' * ', True),
+    ('"other", "0123abcd"', True),
+    ('"other",W/"0123abcd"', True),
+    ('"other"', False),
+    # Подстрока тега или список, склеенный без разделителей, - не совпадение.
+    ('"0123abcd-gzip"', False),
+    ('"0123abc"', False),
+    ('"x""0123abcd"', False),
+    ('0123abcd', False),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(ETAG, if_none_match) is expected
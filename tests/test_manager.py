@@ -0,0 +1,32 @@
+"""Manager: подготовленные запросы по форме фильтра дают тот же результат, что и построенные заново."""
+import pytest
+
+from app.models import User
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_none_filter_matches_null(statements):
+    # В migrated_db у всех 50 пользователей email не задан.
+    assert await User.count(email=None) == 50
+    assert await User.exists(email=None)
+    assert len(await User.filter(email=None)) == 50
+    assert (await User.get(username='user1', email=None)).username == 'user1'
+
+
+async def test_value_and_none_filters_use_different_statements(statements):
+    assert await User.count(email='user1@example.com') == 0
+    assert await User.count(email=None) == 50
+    assert await User.count(email='user1@example.com') == 0
+
+
+async def test_list_filter_is_chunked(statements):
+    users = await User.get_many(range(1, 60), chunk_size=7)
+
+    assert sorted(users) == list(range(1, 51))
+    assert sum(statement.startswith('SELECT users.') for statement, _ in statements) == 9
+
+
+async def test_unknown_attribute(statements):
+    with pytest.raises(AttributeError):
+        await User.get(missing=1)
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from app.services.push import PushHub, LocalPushBroker
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_close_streams_ends_open_and_new_streams():
+    hub = PushHub(LocalPushBroker())
+    await hub.start()
+
+    async def read() -> list[bytes]:
+        return [frame async for frame in hub.listen(lambda message: message.data)]
+
+    stream = asyncio.create_task(read())
+    await asyncio.sleep(0)
+    await hub.publish({'type': 'test'})
+    await asyncio.sleep(0)
+    hub.close_streams()
+
+    assert await asyncio.wait_for(stream, 1) == [b'{"type":"test"}']
+    assert hub.stats()['subscribers'] == 0
+    # Пока сервер останавливается, новые потоки сразу закрываются.
+    assert await asyncio.wait_for(read(), 1) == []
+
+    await hub.stop()
+    await hub.start()
+    queue = hub.subscribe()
+    assert queue.empty()
+    await hub.stop()
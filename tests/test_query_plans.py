@@ -0,0 +1,79 @@
+"""Частые запросы используют индексы: проверка по EXPLAIN QUERY PLAN на схеме из миграций.
+
+Запросы не пишутся в тестах заново - выполняются методы моделей, а план строится для SQL,
+который они действительно отправили в базу.
+"""
+import re
+import sqlite3
+from contextlib import closing
+
+import pytest
+
+from app.models import Event
+
+pytestmark = pytest.mark.anyio
+
+
+def query_plan(path: str, statements: list[tuple[str, tuple]], prefix: str) -> list[str]:
+    """План единственного выполненного запроса, начинающегося с `prefix`."""
+    matching = [(statement, parameters) for statement, parameters in statements
+                if ' '.join(statement.split()).startswith(prefix)]
+    assert len(matching) == 1, f'expected one statement starting with {prefix!r}, got {len(matching)}'
+    statement, parameters = matching[0]
+    with closing(sqlite3.connect(path)) as connection:
+        return [row[3] for row in connection.execute(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+
+
+def assert_no_full_scan(plan: list[str], *tables: str):
+    for table in tables:
+        assert not any(re.match(rf'SCAN {table}\b', line) for line in plan), plan
+
+
+async def test_upcoming_page_uses_meeting_time_index(migrated_db, statements):
+    await Event.get_events_page(limit=20, preview=0)
+    plan = query_plan(migrated_db, statements, 'SELECT events.id')
+    assert 'SEARCH events USING INDEX ix_events_meeting_time (meeting_time>?)' in plan
+    assert_no_full_scan(plan, 'events')
+
+
+async def test_subscriber_previews_use_reverse_index(migrated_db, statements):
+    await Event.get_events_page(limit=20, preview=3)
+    plan = query_plan(migrated_db, statements, 'SELECT anon_1.post_id, users.username')
+    assert any(line.startswith('SEARCH subscribers USING COVERING INDEX ix_subscribers_post_id_user_id (post_id=?)')
+               for line in plan), plan
+    assert_no_full_scan(plan, 'subscribers', 'users')
+
+
+async def test_my_events_subquery_uses_subscribers_primary_key(migrated_db, statements):
+    await Event.get_events_page(limit=20, user_id=1, preview=0)
+    plan = query_plan(migrated_db, statements, 'SELECT events.id')
+    assert 'SEARCH subscribers USING COVERING INDEX sqlite_autoindex_subscribers_1 (user_id=?)' in plan
+    assert_no_full_scan(plan, 'events', 'subscribers')
+
+
+async def test_subscriber_page_uses_reverse_index(migrated_db, statements):
+    await Event.get_subscribers_page(1, limit=10, after_id=2)
+    plan = query_plan(migrated_db, statements, 'SELECT users.id, users.username')
+    assert ('SEARCH subscribers USING COVERING INDEX ix_subscribers_post_id_user_id (post_id=? AND user_id>?)'
+            in plan)
+    assert_no_full_scan(plan, 'subscribers', 'users')
+
+
+def test_on_conflict_target_is_subscribers_primary_key(migrated_db):
+    # ON CONFLICT DO NOTHING проверяет уникальный индекс, EXPLAIN QUERY PLAN эту проверку не показывает.
+    with closing(sqlite3.connect(migrated_db)) as connection:
+        unique = {name for _, name, is_unique, *_ in connection.execute('PRAGMA index_list(subscribers)')
+                  if is_unique}
+        columns = {name: [row[2] for row in connection.execute(f'PRAGMA index_info({name})')] for name in unique}
+    assert ['user_id', 'post_id'] in columns.values(), columns
+
+
+async def test_subscribe_and_unsubscribe_use_indexes(migrated_db, statements):
+    await Event.add_user_or_remove(1, 30, 'add')
+    await Event.add_user_or_remove(1, 30, 'remove')
+    insert_plan = query_plan(migrated_db, statements, 'INSERT INTO subscribers (user_id, post_id) SELECT')
+    assert insert_plan == ['SEARCH events USING INTEGER PRIMARY KEY (rowid=?)']
+    delete_plan = query_plan(migrated_db, statements, 'DELETE FROM subscribers')
+    primary_key = 'sqlite_autoindex_subscribers_1 (user_id=? AND post_id=?)'
+    assert any(line.startswith('SEARCH subscribers USING') and primary_key in line for line in delete_plan), delete_plan
+    assert_no_full_scan(delete_plan, 'subscribers')
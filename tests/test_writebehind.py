@@ -0,0 +1,27 @@
+from contextvars import ContextVar
+
+import pytest
+
+from app.services.writebehind import GroupCommitQueue
+
+pytestmark = pytest.mark.anyio
+
+request_id: ContextVar[str | None] = ContextVar('request_id', default=None)
+
+
+async def test_batches_do_not_inherit_request_context():
+    seen = []
+
+    async def apply(operations):
+        seen.append(request_id.get())
+        return operations
+
+    queue = GroupCommitQueue(apply, enabled=True, max_batch=10, max_delay=0, max_queue=10)
+    # Первый запрос запускает фоновую задачу сам.
+    request_id.set('first')
+    assert await queue.submit(1) == 1
+    request_id.set('second')
+    assert await queue.submit(2) == 2
+    await queue.drain()
+
+    assert seen == [None, None]